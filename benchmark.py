@@ -3,10 +3,21 @@ from refactor.parser import Parser
 from lexer import Lexer
 from evaluator import Evaluator
 from utils import *
-from utils.schema import get_schema_from_json
+from utils.schema import SchemaRegistry
+from utils.result_store import ResultTableStore, PRED_TABLE_FILE, GT_TABLE_FILE
+from utils.sink import JsonlSink
+from utils.parse_cache import ParseCache
+from utils.exec_cache import ExecResultCache
+from utils.report import export_report, write_summary, SUMMARY_FILE
+from utils import trace
 from refactor.nodes import *
 import json
 import re
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import multiprocessing.util
 # import dash_dangerously_set_inner_html
 # from json2tree import convert
 import json
@@ -19,13 +30,6 @@ import yaml
 import sys
 import logging
 
-# dash
-import dash
-from dash import Dash, dash_table, html, dcc
-import pandas as pd
-import dash_ag_grid as dag
-import plotly.express as px
-
 logger = logging.getLogger(__name__)
 logging.basicConfig(
     level=logging.DEBUG,
@@ -37,10 +41,34 @@ logging.basicConfig(
 )
 
 DATA_ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+# parsed ASTs and execution match results cached across runs, under the data dir
+PARSE_CACHE_FILE = 'parse_cache.sqlite'
+EXEC_CACHE_FILE = 'exec_cache.sqlite'
+
+CONTENT_COLUMNS = {
+    'testcase_id': 'Testcase ID',
+    'pred_sql': 'Predicted SQL',
+    'gt_sql': 'Groundtruth SQL',
+    'hardness': 'Hardness',
+    'parsed_pred_sql': 'Parsed Prediction SQL',
+    'parsed_gt_sql': 'Parsed Groundtruth SQL',
+    'exact_match': 'Exact Matching',
+    'component_match': 'Component Matching',
+}
+EXEC_COLUMNS = {
+    'testcase_id': 'Testcase ID',
+    'pred_res_html': 'Predicted Result',
+    'gt_res_html': 'Groundtruth Result',
+    'norm_pred_html': 'Normalized Predicted Result',
+    'norm_gt_html': 'Normalized Groundtruth Result',
+    'complexity': 'Complexity',
+    'is_match': 'Is Match',
+}
 
 def prepare_data_dir():
     data_dir = 'evaluate_data'
     os.makedirs(data_dir, exist_ok=True)
+    return data_dir
 
 def collect_labels_from_dir(gold_dir):
     pass
@@ -86,65 +114,25 @@ def collect_pred_from_dir(pred_dir):
 def collect_pred_from_yaml(pred_file):
     pass
 
-def collect_pred_table_from_dir(pred_table_dir):
-    pred_list = []
-    for run_id in sorted(os.listdir(pred_table_dir)):
-        run_dir = os.path.join(pred_table_dir, run_id)
-        if not os.path.isdir(run_dir):
-            continue
-        table_file = os.path.join(run_dir, 'result/data.json')
-        if os.path.exists(table_file):
-            with open(table_file, 'r', encoding='utf-8') as f:
-                table_data = json.load(f)
-                pred_list.append(table_data)
-        else:
-            pred_list.append(None)
-    return pred_list
+def collect_pred_table_from_dir(pred_table_dir, cache=True, binary_cache=False):
+    # pred_table_dir/run_id/result/data.json
+    return ResultTableStore(pred_table_dir, PRED_TABLE_FILE, cache=cache, binary_cache=binary_cache)
 
-def collect_gt_table_from_dir(gt_table_dir):
-    gt_list = []
-    if not os.path.isdir(gt_table_dir):
-        return gt_list
-    for run_id in sorted(os.listdir(gt_table_dir)):
-        run_dir = os.path.join(gt_table_dir, run_id)
-        if not os.path.isdir(run_dir):
-            continue
-        table_file = os.path.join(run_dir, 'gt_data_result.json')
-        if os.path.exists(table_file):
-            with open(table_file, 'r', encoding='utf-8') as f:
-                table_data = json.load(f)
-                gt_list.append(table_data)
-        else:
-            gt_list.append(None)
-    return gt_list
+def collect_gt_table_from_dir(gt_table_dir, cache=True, binary_cache=False):
+    # gt_table_dir/run_id/gt_data_result.json
+    return ResultTableStore(gt_table_dir, GT_TABLE_FILE, cache=cache, binary_cache=binary_cache)
 
-def init_content_matching():
-    return {
-        'testcase_id': [],
-        'pred_sql': [],
-        'gt_sql': [],
-        'hardness': [],
-        'parsed_gt_sql': [],
-        'parsed_pred_sql': [],
-        'exact_match': [],
-        'component_match': [],
-    }
+def init_content_matching(data_dir):
+    # one record per testcase, with keys:
+    # testcase_id, pred_sql, gt_sql, hardness, parsed_gt_sql, parsed_pred_sql, exact_match, component_match
+    # the parsed SQL and component scores are stored as data, rendered to HTML by `render_content_record`
+    return JsonlSink(os.path.join(data_dir, 'content_matching.jsonl'))
 
-def init_exec_matching():
-    return {
-        'testcase_id': [],
-        'pred_res': [],
-        'pred_res_html': [],
-        'gt_res': [],
-        'gt_res_html': [],
-        'norm_pred': [],
-        'norm_gt': [],
-        'norm_pred_html': [],
-        'norm_gt_html': [],
-        'complexity': [],
-        'is_match': [],
-        'info': [],
-    }
+def init_exec_matching(data_dir):
+    # one record per testcase, with keys:
+    # testcase_id, pred_res, gt_res, norm_pred, norm_gt, complexity, is_match, info
+    # the testcase link and the tables are rendered to HTML by `render_exec_record`
+    return JsonlSink(os.path.join(data_dir, 'exec_matching.jsonl'))
 
 def format_sql_ast_to_html(tree_str):
     indent_level = 0
@@ -271,23 +259,72 @@ def array_to_html_table(array):
     html += "</table>"
     return html
 
+def render_content_record(record):
+    return {
+        **record,
+        'parsed_gt_sql': format_sql_ast_to_html(record['parsed_gt_sql']),
+        'parsed_pred_sql': format_sql_ast_to_html(record['parsed_pred_sql']),
+        'component_match': dict_to_html_tree(record['component_match']),
+    }
+
+def render_exec_record(record):
+    return {
+        **record,
+        'testcase_id': convert_to_link(record['testcase_id']),
+        'pred_res_html': array_to_html_table(record['pred_res']),
+        'gt_res_html': array_to_html_table(record['gt_res']),
+        'norm_pred_html': array_to_html_table(record['norm_pred']),
+        'norm_gt_html': array_to_html_table(record['norm_gt']),
+    }
+
+class ReportRows:
+    """
+    Rows of a report table, read from its sink and rendered to HTML on demand.
+    Each testcase is rendered the first time a view asks for it, then served from the cache.
+    """
+    def __init__(self, sink: JsonlSink, render, max_cached: int = 4096):
+        self._sink = sink
+        self._render = render
+        self.row = lru_cache(maxsize=max_cached)(self._render_row)
+
+    def _render_row(self, idx: int):
+        return self._render(self._sink.read(idx))
+
+    def __len__(self):
+        return len(self._sink)
+
+    def grid_rows(self, fields, positions=None):
+        """Rendered rows (all, or those at `positions`) restricted to the displayed `fields`, so the grid ships nothing else."""
+        positions = range(len(self)) if positions is None else positions
+        return [{field: self.row(idx)[field] for field in fields} for idx in positions]
+
 def convert_to_link(tc_name):
 
     return f"<a href='/testcases/{tc_name}'>{tc_name}</a>"
 
 
-def show_content_matching_table(content_matching):
-    df = pd.DataFrame(content_matching)
-    col_names = {
-        'testcase_id': 'Testcase ID',
-        'pred_sql': 'Predicted SQL',
-        'gt_sql': 'Groundtruth SQL',
-        'hardness': 'Hardness',
-        'parsed_pred_sql': 'Parsed Prediction SQL',
-        'parsed_gt_sql': 'Parsed Groundtruth SQL',
-        'exact_match': 'Exact Matching',
-        'component_match': 'Component Matching',
-    }
+def export_static_report(report_dir, summary, content_matching: JsonlSink, exec_matching: JsonlSink):
+    '''Write the static report of the non-empty sinks and the score summary under `report_dir`, without a server.'''
+    write_summary(os.path.join(report_dir, SUMMARY_FILE), summary)
+    if len(content_matching):
+        export_report(report_dir, 'content_matching', "Content Matching Table", summary, content_matching,
+                      render_content_record, CONTENT_COLUMNS,
+                      html_fields=('parsed_pred_sql', 'parsed_gt_sql', 'component_match'))
+    if len(exec_matching):
+        # the detail tables are inline, the testcase id is not linked to a viewer page
+        export_report(report_dir, 'exec_matching', "Execution Matching Table", summary, exec_matching,
+                      lambda record: {**render_exec_record(record), 'testcase_id': record['testcase_id']}, EXEC_COLUMNS,
+                      html_fields=('pred_res_html', 'gt_res_html', 'norm_pred_html', 'norm_gt_html'))
+    logger.info(f"Static report written to {report_dir}")
+
+def show_content_matching_table(content_matching: JsonlSink):
+    # the viewer dependencies are only needed, and imported, when it is requested
+    import dash
+    from dash import Dash, html
+    import dash_ag_grid as dag
+
+    rows = ReportRows(content_matching, render_content_record)
+    col_names = CONTENT_COLUMNS
 
     default_col_def = {
         "cellRenderer": "markdown",
@@ -317,14 +354,17 @@ def show_content_matching_table(content_matching):
     app.layout = html.Div(
         [
             html.H2("Content Matching Table"),
+            # rows are requested page by page by the browser, see `serve_rows`
             dag.AgGrid(
                 id="content-match-table",
-                rowData=df.to_dict("records"),
+                rowModelType="infinite",
                 columnDefs=column_defs,
                 defaultColDef=default_col_def,
                 dashGridOptions={
                     "pagination": True,
                     "paginationPageSize": 20,
+                    "cacheBlockSize": 20,
+                    "maxBlocksInCache": 10,
                     "rowHeight": 150,
                 },
                 dangerously_allow_code=True,
@@ -336,28 +376,42 @@ def show_content_matching_table(content_matching):
         style={"margin": "2rem"},
     )
 
+    @app.callback(
+            dash.Output('content-match-table', 'getRowsResponse'),
+            dash.Input('content-match-table', 'getRowsRequest'))
+    def serve_rows(request):
+        if request is None:
+            return dash.no_update
+        # in sink order, only the requested block is rendered
+        positions = range(request['startRow'], min(request['endRow'], len(rows)))
+        return {"rowData": rows.grid_rows(col_names, positions), "rowCount": len(rows)}
+
     app.run(debug=True)
 
 def array_to_ag_grid_data(array):
-    if not array or len(array) == 0: return {}
+    '''AgGrid row data, one dict per row keyed by the header.'''
+    if not array or len(array) == 0: return []
     keys = array[0]
-    result = {key: [row[i].strip() if i == 0 else row[i] for row in array[1:]] for i, key in enumerate(keys)}
-    print(f"Result: {result}")
-    return result
-
-def show_exec_matching_table(exec_matching):
-    df = pd.DataFrame(exec_matching)
-    print(f"Exec matching: {exec_matching}")
-    app = Dash(__name__)
-    col_names = {
-        'testcase_id': 'Testcase ID',
-        'pred_res_html': 'Predicted Result',
-        'gt_res_html': 'Groundtruth Result',
-        'norm_pred_html': 'Normalized Predicted Result',
-        'norm_gt_html': 'Normalized Groundtruth Result',
-        'complexity': 'Complexity',
-        'is_match': 'Is Match',
-    }
+    return [{key: row[i].strip() if i == 0 else row[i] for i, key in enumerate(keys)} for row in array[1:]]
+
+def show_exec_matching_table(exec_matching: JsonlSink, total=0, total_match=0):
+    import dash
+    from dash import Dash, html, dcc
+    import dash_ag_grid as dag
+    import pandas as pd
+    import plotly.express as px
+    from utils.grid_query import query_rows
+
+    # only the scalar columns are kept in memory, to sort / filter the grid and plot, indexed by sink position
+    # the columns are explicit for an empty sink, complexity stays numeric to be sorted and filtered as a number
+    df = pd.DataFrame([
+        (record['testcase_id'], record['complexity'], record['is_match'])
+        for record in exec_matching
+    ], columns=['testcase_id', 'complexity', 'is_match'])
+    rows = ReportRows(exec_matching, render_exec_record)
+    # the grid is in the page content, rendered by `display_page`
+    app = Dash(__name__, suppress_callback_exceptions=True)
+    col_names = EXEC_COLUMNS
 
     default_col_def = {
         "cellRenderer": "markdown",
@@ -377,20 +431,21 @@ def show_exec_matching_table(exec_matching):
         "autoHeight": False,
     }
 
+    # sorted and filtered on the server, see `serve_rows`
+    col_filters = {'testcase_id': 'agTextColumnFilter', 'complexity': 'agNumberColumnFilter', 'is_match': 'agTextColumnFilter'}
     column_defs = [
-        {"field": k, "headerName": v, "maxWidth": 600, "minWidth": 300 if 'res' in k or 'norm' in k else 200,}
+        {"field": k, "headerName": v, "maxWidth": 600, "minWidth": 300 if 'res' in k or 'norm' in k else 200,
+         "sortable": k in col_filters, "filter": col_filters.get(k, False)}
         for k, v in col_names.items()
     ]
 
-    total = exec_matching.get('total', 0)
-    total_match = exec_matching.get('total_match', 0)
-
-    df['complexity'] = df['complexity'].astype(str)
-    unique_complexities = sorted(df['complexity'].unique(), key=lambda x: int(x))
+    # plotted as categories, on a copy so the grid still sorts complexity as a number
+    hist_df = df.assign(complexity=df['complexity'].astype(str))
+    unique_complexities = sorted(hist_df['complexity'].unique(), key=lambda x: int(x))
     full_complexity_range = [str(i) for i in range(1, 6)]
 
     complexity_hist = px.histogram(
-        df,
+        hist_df,
         x="complexity",
         color="is_match",
         category_orders={"complexity": full_complexity_range},
@@ -398,16 +453,17 @@ def show_exec_matching_table(exec_matching):
     )
     main_table = []
 
-    print(f"Row data: {df.to_dict("records")}")
-
+    # rows are requested page by page by the browser, see `serve_rows`
     all_testcase_table = dag.AgGrid(
-                id="content-match-table",
-                rowData=df.to_dict("records"),
+                id="exec-match-table",
+                rowModelType="infinite",
                 columnDefs=column_defs,
                 defaultColDef=default_col_def,
                 dashGridOptions={
                     "pagination": True,
                     "paginationPageSize": 20,
+                    "cacheBlockSize": 20,
+                    "maxBlocksInCache": 10,
                     "rowHeight": 150,
                 },
                 dangerously_allow_code=True,
@@ -454,98 +510,283 @@ def show_exec_matching_table(exec_matching):
     #     row = selected_rows[0]
     #     return html.Pre(json.dumps(row, indent=2, ensure_ascii=False))
     
+    @app.callback(
+            dash.Output('exec-match-table', 'getRowsResponse'),
+            dash.Input('exec-match-table', 'getRowsRequest'))
+    def serve_rows(request):
+        if request is None:
+            return dash.no_update
+        positions, row_count = query_rows(df, request)
+        return {"rowData": rows.grid_rows(col_names, positions), "rowCount": row_count}
+
+    # testcase id -> sink position, the first one for duplicated ids
+    testcase_positions = {}
+    for pos, testcase_id in enumerate(df['testcase_id']):
+        testcase_positions.setdefault(testcase_id, pos)
+
+    def table_grid(grid_id, table, style=None):
+        return dag.AgGrid(
+            id=grid_id,
+            rowData=array_to_ag_grid_data(table),
+            columnDefs=[
+                {"field": k, "headerName": k}
+                for k in (table[0] if table else [])
+            ],
+            defaultColDef=default_col_def,
+            dashGridOptions={
+                "pagination": True,
+                "paginationPageSize": 10,
+                "rowSelection": "single",
+            },
+            dangerously_allow_code=True,
+            style=style,
+        )
+
+    @lru_cache(maxsize=256)
+    def testcase_detail(pos):
+        '''Detail page of one testcase, built on the first visit.'''
+        record = exec_matching.read(pos)
+        return html.Div([
+            html.H2(f"Testcase {record['testcase_id']}"),
+            html.H3("Predicted table"),
+            table_grid("pred-res-table", record['pred_res'], style={"display": "inline-block"}),
+            html.H3("Groundtruth table"),
+            table_grid("gt-res-table", record['gt_res']),
+            html.H3("Normalized predicted table"),
+            table_grid("norm-pred-table", record['norm_pred']),
+            html.H3("Normalize groundtruth table"),
+            table_grid("norm-gt-table", record['norm_gt']),
+            html.H3("Result"),
+            html.Div("Match" if record['is_match'] else "Not match"),
+            html.H3("Info"),
+            html.Div(record['info']),
+        ])
+
     @app.callback(
             dash.Output('page-content', 'children'),
             dash.Input('url', 'pathname'))
     def display_page(pathname):
         if pathname and pathname.startswith('/testcases/'):
             testcase_id = pathname.split('/testcases/')[1]
-            row = df[df['testcase_id'] == f"<a href='/testcases/{testcase_id}'>{testcase_id}</a>"]
-            print(f"Is match: {row.iloc[0]['is_match']}")
-            if not row.empty:
-                info = row.iloc[0]['info']
-                row_data = pd.DataFrame(array_to_ag_grid_data(row.iloc[0]['pred_res'])).to_dict("records")
-                print(row_data)
-                return html.Div([
-                    html.H2(f"Testcase {testcase_id}"),
-                    html.H3("Predicted table"),
-                    dag.AgGrid(
-                        id="content-match-table",
-                        rowData=pd.DataFrame(array_to_ag_grid_data(row.iloc[0]['pred_res'])).to_dict("records"),
-                        columnDefs=[
-                            {"field": k, "headerName": k}
-                            for k in row.iloc[0]['pred_res'][0]
-                        ],
-                        defaultColDef=default_col_def,
-                        dashGridOptions={
-                            "pagination": True,
-                            "paginationPageSize": 10,
-                            "rowSelection": "single",
-                        },
-                        dangerously_allow_code=True,
-                        style={"display": "inline-block"}
-                    ),
-                    html.H3("Groundtruth table"),
-                    dag.AgGrid(
-                        id="content-match-table",
-                        rowData=pd.DataFrame(array_to_ag_grid_data(row.iloc[0]['gt_res'])).to_dict("records"),
-                        columnDefs=[
-                            {"field": k, "headerName": k}
-                            for k in row.iloc[0]['gt_res'][0]
-                        ],
-                        defaultColDef=default_col_def,
-                        dashGridOptions={
-                            "pagination": True,
-                            "paginationPageSize": 10,
-                            "rowSelection": "single",
-                        },
-                        dangerously_allow_code=True,
-                    ),
-                    html.H3("Normalized predicted table"),
-                    dag.AgGrid(
-                        id="content-match-table",
-                        rowData=pd.DataFrame(array_to_ag_grid_data(row.iloc[0]['norm_pred'])).to_dict("records"),
-                        columnDefs=[
-                            {"field": k, "headerName": k}
-                            for k in row.iloc[0]['norm_pred'][0]
-                        ],
-                        defaultColDef=default_col_def,
-                        dashGridOptions={
-                            "pagination": True,
-                            "paginationPageSize": 10,
-                            "rowSelection": "single",
-                        },
-                        dangerously_allow_code=True,
-                    ),
-                    html.H3("Normalize groundtruth table"),
-                    dag.AgGrid(
-                        id="content-match-table",
-                        rowData=pd.DataFrame(array_to_ag_grid_data(row.iloc[0]['norm_gt'])).to_dict("records"),
-                        columnDefs=[
-                            {"field": k, "headerName": k}
-                            for k in row.iloc[0]['norm_gt'][0]
-                        ],
-                        defaultColDef=default_col_def,
-                        dashGridOptions={
-                            "pagination": True,
-                            "paginationPageSize": 10,
-                            "rowSelection": "single",
-                        },
-                        dangerously_allow_code=True,
-                    ),
-                    html.H3("Result"),
-                    html.Div("Match" if row.iloc[0]['is_match'] else "Not match"),
-                    html.H3("Info"),
-                    html.Div(row.iloc[0]['info']),
-                ])
+            if testcase_id in testcase_positions:
+                return testcase_detail(testcase_positions[testcase_id])
             else:
                 return html.Div("Testcase not found.")
         return main_page_content
 
     app.run(debug=True)
 
-def evaluate(gold_sql_file, table_json, etype, kmaps, pred_sql_dir=None, gold_res_dir=None, pred_res_dir=None):
-    evaluator = Evaluator()
+# per-process state, loaded once by `init_worker` (in the main process, or once per pool worker)
+_worker_state = {}
+
+def init_worker(table_json, pred_res_dir, gold_res_dir, trace_enabled=False, table_cache=False, parse_cache_path=None,
+                exec_cache_path=None, need_diff=True):
+    if trace_enabled:
+        trace.enable()
+    # parsed ASTs and execution match results are shared across runs and workers through the on-disk caches
+    _worker_state['parse_cache'] = ParseCache(parse_cache_path) if parse_cache_path else None
+    _worker_state['exec_cache'] = ExecResultCache(exec_cache_path) if exec_cache_path else None
+    if multiprocessing.parent_process() is not None:
+        # a pool worker exits through multiprocessing's exit hook, which runs finalizers but not atexit
+        multiprocessing.util.Finalize(None, close_worker_caches, exitpriority=10)
+    _worker_state['evaluator'] = Evaluator()
+    # without the diff, clearly settled execution matches skip normalizing their tables
+    _worker_state['exec_options'] = {} if need_diff else {'need_diff': False}
+    # parse tables.json once, each database schema is built on first use
+    _worker_state['schemas'] = SchemaRegistry(table_json)
+    # index result tables once, each testcase reads its own tables once so they are not cached
+    _worker_state['pred_tables'] = collect_pred_table_from_dir(pred_res_dir, cache=False, binary_cache=table_cache)
+    _worker_state['gt_tables'] = collect_gt_table_from_dir(gold_res_dir, cache=False, binary_cache=table_cache)
+    logger.debug(f"Predicted table runs: {_worker_state['pred_tables'].run_ids}")
+    logger.debug(f"Ground truth table runs: {_worker_state['gt_tables'].run_ids}")
+
+def close_worker_caches():
+    '''Flush the buffered cache hits and evictions of this process, then close its caches.'''
+    for name in ('parse_cache', 'exec_cache'):
+        cache = _worker_state.pop(name, None)
+        if cache is not None:
+            cache.close()
+
+def collect_testcases(gold_sql_file, pred_sql_dir, etype):
+    """
+    Collect stage: yield one task (idx, pred SQL string, gold label dict, etype) per testcase.
+    """
+    glist = collect_labels_from_yaml(gold_sql_file)
+    plist = collect_pred_from_dir(pred_dir=os.getenv('TEST_AQUA_BENCHMARK_DIRECTORY', pred_sql_dir))
+    logger.info(f"Evaluating {len(plist)} predictions against {len(glist)} ground truths")
+    for idx, (p, g) in enumerate(zip(plist, glist)):
+        yield idx, p, g, etype
+
+def parse_sql(sql_str, schema):
+    """Lex and parse one SQL string, through the parse cache when enabled."""
+    def parse():
+        return Parser(lexer=Lexer(sql_str, schema=schema), schema=schema).parse()
+    parse_cache = _worker_state.get('parse_cache')
+    if parse_cache is None:
+        return parse()
+    return parse_cache.parse(sql_str, schema, parse)
+
+def parse_testcase(task):
+    """
+    Parse stage: lex and parse the gold and predicted SQL of one testcase.
+    """
+    idx, p_str, g, etype = task
+    g_str, db_name = g['query'], g['db']
+    try:
+        schema = _worker_state['schemas'][db_name]
+    except KeyError as e:
+        # like an invalid gold SQL: the testcase is scored with empty SQLs instead of aborting the run
+        logger.error(f"Cannot parse testcase {g['tc_id']}: {e}")
+        return task, Sql(), Sql(), True
+    eval_err = False
+    try:
+        g_sql = parse_sql(g_str, schema)
+        if trace.ENABLED:
+            trace.event('parse', 'gold_sql', idx=idx, sql=g_sql)
+    except Exception as e:
+        g_sql = Sql()
+        eval_err = True
+
+    try:
+        p_sql = parse_sql(p_str, schema)
+    except:
+        # if p_sql is not valid, then we will use an empty sql to evaluate with the correct sql
+        p_sql = Sql()
+
+    # # rebuild sql for value evaluation
+    # kmap = kmaps[db_name]
+    # g_valid_col_units = rebuilder.build_valid_col_units(g_sql['from']['table_units'], schema)
+    # g_sql = rebuilder.rebuild_sql_val(g_sql)
+    # g_sql = rebuilder.rebuild_sql_col(g_valid_col_units, g_sql, kmap)
+    # p_valid_col_units = rebuilder.build_valid_col_units(p_sql['from']['table_units'], schema)
+    # p_sql = rebuilder.rebuild_sql_val(p_sql)
+    # p_sql = rebuilder.rebuild_sql_col(p_valid_col_units, p_sql, kmap)
+    return task, g_sql, p_sql, eval_err
+
+def score_testcase(parsed):
+    """
+    Score stage: content and/or execution matching of one parsed testcase.
+
+    :returns: dict with the parsed SQL strings and the content/exec matching records of this testcase
+    """
+    (idx, p_str, g, etype), g_sql, p_sql, eval_err = parsed
+    evaluator = _worker_state['evaluator']
+    tc_id, g_str, nl, complexity = g['tc_id'], g['query'], g['nl'], g['complexity']
+
+    # hardness = HardnessEvaluator(g_sql).eval_hardness()
+    hardness = 'easy'
+
+    result = {
+        'idx': idx,
+        'g_str': g_str,
+        'p_str': p_str,
+        'g_sql': str(g_sql),
+        'p_sql': str(p_sql),
+        'hardness': hardness,
+        'eval_err': eval_err,
+        'content': None,
+        'exec': None,
+    }
+
+    if etype in ["all", "match"]:
+        partial_scores, exact_match = evaluator.eval_partial_match(p_sql, g_sql)
+        # breakpoint()
+        # scores[hardness]['exact'] += exact_score
+        # scores['all']['exact'] += exact_score
+        # for type_ in partial_types:
+        #     scores[hardness]['partial'][type_]['acc'] += partial_scores[type_].get('acc', 0)
+        #     scores[hardness]['partial'][type_]['acc_count'] += partial_scores[type_].get('acc_count', 0)
+        #     scores[hardness]['partial'][type_]['rec'] += partial_scores[type_].get('rec', 0)
+        #     scores[hardness]['partial'][type_]['rec_count'] += partial_scores[type_].get('rec_count', 0)
+        #     scores[hardness]['partial'][type_]['f1'] += partial_scores[type_].get('f1', 0)
+        #     scores['all']['partial'][type_]['acc'] += partial_scores[type_].get('acc', 0)
+        #     scores['all']['partial'][type_]['acc_count'] += partial_scores[type_].get('acc_count', 0)
+        #     scores['all']['partial'][type_]['rec'] += partial_scores[type_].get('rec', 0)
+        #     scores['all']['partial'][type_]['rec_count'] += partial_scores[type_].get('rec_count', 0)
+        #     scores['all']['partial'][type_]['f1'] += partial_scores[type_].get('f1', 0)
+
+        result['content'] = {
+            'testcase_id': tc_id,
+            'pred_sql': p_str,
+            'gt_sql': g_str,
+            'hardness': hardness,
+            # rendered to HTML only when viewed, see `render_content_record`
+            'parsed_gt_sql': result['g_sql'],
+            'parsed_pred_sql': result['p_sql'],
+            'exact_match': exact_match,
+            'component_match': partial_scores,
+        }
+
+    if etype in ["all", "exec"]:
+        pred_table = _worker_state['pred_tables'][idx]
+        gt_table = _worker_state['gt_tables'][idx]
+        exec_cache = _worker_state['exec_cache']
+        exec_options = _worker_state['exec_options']
+        if exec_cache is None:
+            exec_score, norm_pred, norm_gt, info = evaluator.eval_exec_match(pred_table, gt_table, nl, **exec_options)
+        else:
+            exec_score, norm_pred, norm_gt, info = exec_cache.match(pred_table, gt_table, nl, evaluator.eval_exec_match,
+                                                                    **exec_options)
+        # if exec_score:
+        #     scores[hardness]['exec'] += 1.0
+        #     scores['all']['exec'] += 1.0
+
+        result['exec'] = {
+            'testcase_id': tc_id,
+            # rendered to HTML only when viewed, see `render_exec_record`
+            'pred_res': pred_table,
+            'gt_res': gt_table,
+            'norm_pred': norm_pred,
+            'norm_gt': norm_gt,
+            'complexity': complexity,
+            'is_match': bool(exec_score),
+            'info': info
+        }
+    return result
+
+def evaluate_testcase(task):
+    """Parse and score one testcase, the unit of work sent to pool workers."""
+    return score_testcase(parse_testcase(task))
+
+def run_testcases(tasks, workers, table_json, pred_res_dir, gold_res_dir, table_cache=False, parse_cache_path=None,
+                  exec_cache_path=None, need_diff=True):
+    """
+    Yield the scored result of each task, in task order.
+    With more than one worker, at most `workers * 4` tasks are in flight at a time,
+    so memory does not grow with the suite size.
+    """
+    if workers <= 1:
+        init_worker(table_json, pred_res_dir, gold_res_dir, trace.ENABLED, table_cache, parse_cache_path, exec_cache_path,
+                    need_diff)
+        try:
+            for task in tasks:
+                yield evaluate_testcase(task)
+        finally:
+            close_worker_caches()
+        return
+
+    # schemas and result tables are loaded once per worker
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(table_json, pred_res_dir, gold_res_dir, trace.ENABLED, table_cache,
+                                       parse_cache_path, exec_cache_path, need_diff)) as executor:
+        in_flight = deque()
+        for task in tasks:
+            in_flight.append(executor.submit(evaluate_testcase, task))
+            if len(in_flight) >= workers * 4:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def evaluate(gold_sql_file, table_json, etype, kmaps, pred_sql_dir=None, gold_res_dir=None, pred_res_dir=None, workers=1,
+             table_cache=False, parse_cache=True, exec_cache=True, headless=False, report_dir=None, need_diff=True):
+    """
+    Streaming evaluation: collect -> parse -> score -> sink.
+    Each testcase record is written to the sinks under the data dir as soon as it is scored,
+    only the running scores are kept in memory.
+    Then the results are served by the interactive viewer, or with `headless` written as a static
+    report under `report_dir` (default: `report` in the data dir). Return the score summary.
+    Without `need_diff`, the normalized tables of clearly settled execution matches are not computed nor reported.
+    """
     rebuilder = Rebuilder()
     visualizer = Visualizer()
 
@@ -556,10 +797,7 @@ def evaluate(gold_sql_file, table_json, etype, kmaps, pred_sql_dir=None, gold_re
     logger.info(f"Using gold SQL file: {gold_sql_file}, pred SQL directory: {pred_sql_dir}, gold result directory: {gold_res_dir}, pred result directory: {pred_res_dir}")
 
 
-    prepare_data_dir()
-
-    glist = collect_labels_from_yaml(gold_sql_file)
-    plist = collect_pred_from_dir(pred_dir=os.getenv('TEST_AQUA_BENCHMARK_DIRECTORY', pred_sql_dir))
+    data_dir = prepare_data_dir()
 
     # breakpoint()
 
@@ -568,8 +806,10 @@ def evaluate(gold_sql_file, table_json, etype, kmaps, pred_sql_dir=None, gold_re
                      'group', 'order', 'and/or', 'IUEN', 'keywords']
     entries = []
     scores = {}
-    content_matching_dict = init_content_matching()
-    exec_matching_dict = init_exec_matching()
+    content_matching = init_content_matching(data_dir)
+    exec_matching = init_exec_matching(data_dir)
+    total, total_match = 0, 0
+    complexity_counts = {}
 
     for level in levels:
         scores[level] = {'count': 0, 'partial': {}, 'exact': 0.}
@@ -578,83 +818,23 @@ def evaluate(gold_sql_file, table_json, etype, kmaps, pred_sql_dir=None, gold_re
             scores[level]['partial'][type_] = {'acc': 0., 'rec': 0., 'f1': 0.,'acc_count':0,'rec_count':0}
 
     eval_err_num = 0
-    logger.info(f"Evaluating {len(plist)} predictions against {len(glist)} ground truths")
-    for idx, (p, g) in enumerate(zip(plist, glist)):
-        p_str = p
-        tc_id, g_str, db_name, nl, complexity = g['tc_id'], g['query'], g['db'], g['nl'], g['complexity']  # get  schema name for future extension
-        schema_name, schema = get_schema_from_json(table_json)
-        schema = Schema(schema, schema_name)
-        try:
-            g_parser = Parser(lexer=Lexer(g_str, schema=schema), schema=schema)
-            g_sql = g_parser.parse()
-            logger.info(f"Parsed Gold SQL: {g_sql}")
-        except Exception as e:
-            g_sql = Sql()
+    logger.info(f"Evaluating with {workers} worker(s)")
+    tasks = collect_testcases(gold_sql_file, pred_sql_dir, etype)
+    parse_cache_path = os.path.join(data_dir, PARSE_CACHE_FILE) if parse_cache else None
+    exec_cache_path = os.path.join(data_dir, EXEC_CACHE_FILE) if exec_cache else None
+    for result in run_testcases(tasks, workers, table_json, pred_res_dir, gold_res_dir, table_cache, parse_cache_path,
+                                exec_cache_path, need_diff):
+        if result['eval_err']:
             eval_err_num += 1
-
-        # hardness = HardnessEvaluator(g_sql).eval_hardness()
-        hardness = 'easy'
+        hardness = result['hardness']
         scores[hardness]['count'] += 1
         scores['all']['count'] += 1
 
-        try:
-            p_parser = Parser(lexer=Lexer(p_str, schema=schema), schema=schema)
-            p_sql = p_parser.parse()
-        except:
-            # if p_sql is not valid, then we will use an empty sql to evaluate with the correct sql
-            p_sql = Sql()
-
-        visualizer.print_to_file('SQL String', g_str, p_str)
-        visualizer.print_to_file('SQL Dict', g_sql, p_sql)
-
-
-        # # rebuild sql for value evaluation
-        # kmap = kmaps[db_name]
-        # g_valid_col_units = rebuilder.build_valid_col_units(g_sql['from']['table_units'], schema)
-        # g_sql = rebuilder.rebuild_sql_val(g_sql)
-        # g_sql = rebuilder.rebuild_sql_col(g_valid_col_units, g_sql, kmap)
-        # p_valid_col_units = rebuilder.build_valid_col_units(p_sql['from']['table_units'], schema)
-        # p_sql = rebuilder.rebuild_sql_val(p_sql)
-        # p_sql = rebuilder.rebuild_sql_col(p_valid_col_units, p_sql, kmap)
-
-        pred_tables = collect_pred_table_from_dir(pred_res_dir)
-        gt_tables = collect_gt_table_from_dir(gold_res_dir)
-
-        logger.debug(f"Predicted tables: {pred_tables}")
-        logger.debug(f"Ground truth tables: {gt_tables}")
-
-        if etype in ["all", "match"]:
-            print(f"Etype in match")
-            partial_scores, exact_match = evaluator.eval_partial_match(p_sql, g_sql)
-            # breakpoint()
-            # scores[hardness]['exact'] += exact_score
-            # scores['all']['exact'] += exact_score
-            # for type_ in partial_types:
-            #     scores[hardness]['partial'][type_]['acc'] += partial_scores[type_].get('acc', 0)
-            #     scores[hardness]['partial'][type_]['acc_count'] += partial_scores[type_].get('acc_count', 0)
-            #     scores[hardness]['partial'][type_]['rec'] += partial_scores[type_].get('rec', 0)
-            #     scores[hardness]['partial'][type_]['rec_count'] += partial_scores[type_].get('rec_count', 0)
-            #     scores[hardness]['partial'][type_]['f1'] += partial_scores[type_].get('f1', 0)
-            #     scores['all']['partial'][type_]['acc'] += partial_scores[type_].get('acc', 0)
-            #     scores['all']['partial'][type_]['acc_count'] += partial_scores[type_].get('acc_count', 0)
-            #     scores['all']['partial'][type_]['rec'] += partial_scores[type_].get('rec', 0)
-            #     scores['all']['partial'][type_]['rec_count'] += partial_scores[type_].get('rec_count', 0)
-            #     scores['all']['partial'][type_]['f1'] += partial_scores[type_].get('f1', 0)
-
-            for key, value in [
-                ('testcase_id', tc_id),
-                ('pred_sql', p_str),
-                ('gt_sql', g_str),
-                ('hardness', hardness),
-                ('parsed_gt_sql', format_sql_ast_to_html(str(g_sql))),
-                ('parsed_pred_sql', format_sql_ast_to_html(str(p_sql))),
-                # ('parsed_gt_sql', str(g_sql)),
-                # ('parsed_pred_sql', str(p_sql))
-                ('exact_match', exact_match),
-                # ('component_match', json.dumps(partial_scores, indent=2)),
-                ('component_match', dict_to_html_tree(partial_scores)),
-            ]:
-                content_matching_dict[key].append(value)
+        visualizer.print_to_file('SQL String', result['g_str'], result['p_str'])
+        visualizer.print_to_file('SQL Dict', result['g_sql'], result['p_sql'])
+
+        if result['content'] is not None:
+            content_matching.write(result['content'])
 
             # entries.append({
             #     'predictSQL': p_str,
@@ -663,29 +843,18 @@ def evaluate(gold_sql_file, table_json, etype, kmaps, pred_sql_dir=None, gold_re
             #     'exact': 1,
             #     'partial': 1
             # })
-            logger.info(f"Content matching table: {content_matching_dict}")
+            logger.info(f"Content matching record: {result['content']}")
 
-        if etype in ["all", "exec"]:
-            exec_score, norm_pred, norm_gt, info = evaluator.eval_exec_match(pred_tables[idx], gt_tables[idx], nl)
-            # if exec_score:
-            #     scores[hardness]['exec'] += 1.0
-            #     scores['all']['exec'] += 1.0
-
-            for k, v in [
-                ('testcase_id', convert_to_link(tc_id)),
-                ('pred_res', pred_tables[idx]),
-                ('gt_res', gt_tables[idx]),
-                ('pred_res_html', array_to_html_table(pred_tables[idx])),
-                ('gt_res_html', array_to_html_table(gt_tables[idx])),
-                ('norm_pred', norm_pred),
-                ('norm_gt', norm_gt),
-                ('norm_pred_html', array_to_html_table(norm_pred)),
-                ('norm_gt_html', array_to_html_table(norm_gt)),
-                ('complexity', complexity),
-                ('is_match', exec_score),
-                ('info', info)
-            ]:
-                exec_matching_dict[k].append(v)
+        if result['exec'] is not None:
+            exec_matching.write(result['exec'])
+            total += 1
+            total_match += result['exec']['is_match']
+            counts = complexity_counts.setdefault(str(result['exec']['complexity']), {'count': 0, 'match': 0})
+            counts['count'] += 1
+            counts['match'] += result['exec']['is_match']
+
+    content_matching.close()
+    exec_matching.close()
 
     for level in levels:
         if scores[level]['count'] == 0:
@@ -715,12 +884,23 @@ def evaluate(gold_sql_file, table_json, etype, kmaps, pred_sql_dir=None, gold_re
 
     visualizer.write_scores_to_terminal(scores=scores, etype=etype)
     visualizer.write_scores_to_file(scores=scores, etype=etype)
-    if etype in ["match"]:
-        show_content_matching_table(content_matching_dict)
+    summary = {
+        'etype': etype,
+        'total': total,
+        'total_match': total_match,
+        'match_rate': total_match / total if total else 0.,
+        'eval_err_num': eval_err_num,
+        'complexity': dict(sorted(complexity_counts.items())),
+        'scores': scores,
+    }
+    if headless:
+        export_static_report(report_dir or os.path.join(data_dir, 'report'), summary, content_matching, exec_matching)
+    elif etype in ["match"]:
+        show_content_matching_table(content_matching)
     elif etype in ["exec"]:
-        exec_matching_dict['total'] = len(exec_matching_dict['testcase_id'])
-        exec_matching_dict['total_match'] = sum(exec_matching_dict['is_match'])
-        show_exec_matching_table(exec_matching_dict)
+        show_exec_matching_table(exec_matching, total=total, total_match=total_match)
+    return summary
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
@@ -731,6 +911,23 @@ if __name__ == "__main__":
 
     parser.add_argument('--table', dest='table', type=str)
     parser.add_argument('--etype', dest='etype', type=str)
+    parser.add_argument('--workers', dest='workers', type=int, default=1,
+                        help='number of worker processes used to evaluate testcases')
+    parser.add_argument('--trace', dest='trace', action='store_true',
+                        help=f'emit lexer/parser/evaluator trace events with timings (or set {trace.TRACE_ENV_VAR}=1)')
+    parser.add_argument('--table-cache', dest='table_cache', action='store_true',
+                        help='cache result tables as memory-mapped .npy columns next to their JSON files, reused by later runs')
+    parser.add_argument('--no-parse-cache', dest='parse_cache', action='store_false',
+                        help='always lex and parse the SQL, without the on-disk cache of parsed ASTs')
+    parser.add_argument('--no-exec-cache', dest='exec_cache', action='store_false',
+                        help='always compare the result tables, without the on-disk cache of execution match results')
+    parser.add_argument('--headless', dest='headless', action='store_true',
+                        help='write a static report and the score summary then exit, instead of serving the interactive viewer')
+    parser.add_argument('--report-dir', dest='report_dir', type=str, default=None,
+                        help='directory of the static report written with --headless (default: evaluate_data/report)')
+    parser.add_argument('--no-diff', dest='need_diff', action='store_false',
+                        help='skip normalizing the result tables of clear execution matches and mismatches, '
+                             'the report then shows no normalized tables for them')
     args = parser.parse_args()
 
     gold_sql_file = args.gold_sql
@@ -740,9 +937,13 @@ if __name__ == "__main__":
 
     table = args.table
     etype = args.etype
+    workers = args.workers
+    if args.trace:
+        trace.enable()
 
     assert etype in ["all", "exec", "match"], "Unknown evaluation method"
 
     kmaps = Rebuilder().build_foreign_key_map_from_json(table)
 
-    evaluate(gold_sql_file, table, etype, kmaps, pred_sql_dir, gold_res_dir, pred_res_dir)
\ No newline at end of file
+    evaluate(gold_sql_file, table, etype, kmaps, pred_sql_dir, gold_res_dir, pred_res_dir, workers, args.table_cache,
+             args.parse_cache, args.exec_cache, args.headless, args.report_dir, args.need_diff)
\ No newline at end of file
@@ -1,16 +1,40 @@
 from utils.constants import *
 from utils.evaluation_visitor import SqlVisitor
+from utils import trace
 import logging
 import numpy as np
 import logging
 import sys
 from refactor.nodes import *
-from typing import List, Tuple, Any
+from typing import List, Tuple, Any, Iterable, Optional
+from collections import Counter
 import datetime
+from functools import lru_cache
 from nltk import word_tokenize
 
 logger = logging.getLogger(__name__)
 
+NEG_TOKS = frozenset(['not', 'no', 'without', 'exclude',  'except', 'ignore', 'skip', 'omit'])
+
+@lru_cache(maxsize=1024)
+def nl_mention_toks(nl: str) -> Tuple[frozenset, ...]:
+    '''Token sets of the sentences of a question, without the negated sentences which mention nothing.'''
+    sentences_toks = (frozenset(word_tokenize(sent)) for sent in nl.lower().split('.'))
+    return tuple(toks for toks in sentences_toks if not toks & NEG_TOKS)
+
+@lru_cache(maxsize=4096)
+def col_name_toks(col_name: str) -> frozenset:
+    return frozenset(t.lower() for t in word_tokenize(col_name))
+
+_HASH_MASK = (1 << 64) - 1
+
+def rows_hash(rows: List[List[Any]]) -> int:
+    '''
+    Order-independent 64-bit hash of the rows of a table, summing one hash per row.
+    A row is hashed from the sum of the hashes of its cells as strings, so it doesn't depend on the column order either.
+    '''
+    return sum(hash((sum(map(hash, map(str, row))),)) for row in rows) & _HASH_MASK
+
 class Evaluator(SqlVisitor):
     def __init__(self):
         self.partial_scores = None
@@ -27,6 +51,7 @@ class Evaluator(SqlVisitor):
             return label_tables == pred_tables
         return 1
 
+    @trace.timed('match')
     def eval_partial_match(self, pred: Sql, label: Sql):
         assert isinstance(pred, Sql) and isinstance(label, Sql), "Both pred and label must be Sql instances"
         partial_scores, exact_match = self.visit(pred, label)
@@ -106,24 +131,34 @@ class Evaluator(SqlVisitor):
         #         'norm_pred': pred_table,
         #         'norm_gt': gt_table
         #     }
-        def array_to_dict(array):
+        def column_fingerprints(array):
+            '''Map each column name to the set of its values, fingerprinted once as a hashable frozenset.'''
             if not array or len(array) == 0: return {}
             keys = array[0]
-            result = {key: [row[i].strip() if i == 0 else row[i] for row in array[1:]] for i, key in enumerate(keys)}
-            print(f"Result: {result}")
-            return result
-        gt_table_dict = array_to_dict(gt_table)
-        pred_table_dict = array_to_dict(pred_table)
+            return {key: frozenset(row[i].strip() if i == 0 else row[i] for row in array[1:]) for i, key in enumerate(keys)}
+
+        def first_positions(header):
+            positions = {}
+            for idx, key in enumerate(header):
+                positions.setdefault(key, idx)
+            return positions
+
+        gt_fingerprints = column_fingerprints(gt_table)
+        pred_fingerprints = column_fingerprints(pred_table)
+
+        # gt columns by value set, a pred column is matched with the last gt column holding the same values
+        gt_cols_by_values = {}
+        for gt_col, values in gt_fingerprints.items():
+            gt_cols_by_values[values] = gt_col
+        pred_positions = first_positions(pred_table[0]) if pred_fingerprints else {}
+        gt_positions = first_positions(gt_table[0]) if gt_fingerprints else {}
 
         column_match_dict = {}  # pred_col : gt_col
         pred_col_order = []
         gt_col_order = []
-        for pred_col in pred_table_dict.keys():
-            for gt_col in gt_table_dict.keys():
-                if set(pred_table_dict[pred_col]) == set(gt_table_dict[gt_col]):
-                    pred_col_idx = np.where(np.array(pred_table[0]) == pred_col)[0][0]
-                    gt_col_idx = np.where(np.array(gt_table[0]) == gt_col)[0][0]
-                    column_match_dict[pred_col_idx] = gt_col_idx
+        for pred_col, values in pred_fingerprints.items():
+            if values in gt_cols_by_values:
+                column_match_dict[pred_positions[pred_col]] = gt_positions[gt_cols_by_values[values]]
         
         for k, v in  column_match_dict.items():
             pred_col_order.append(k)
@@ -158,42 +193,105 @@ class Evaluator(SqlVisitor):
             info.append(f"Number of pred columns is smaller than number of gt columns: {len(norm_pred[0])} vs {len(norm_label[0])}. The model may forget an important column.")
             return False, None
         else:
-            # match columns to find surplus one
-            col_pairs = []
-            for i in range(len(norm_pred[0])):
-                for j in range(len(norm_label[0])):
-                    if all(np.array(norm_pred)[1:, i] == np.array(norm_label)[1:,j]):
-                        col_pairs.append((norm_pred[0][i], norm_label[0][j]))
-            surplus_cols = set(norm_pred[0]) - set([col_name for col_name, _ in col_pairs])
+            # match columns to find surplus one, each column is converted once into a hashable key
+            label_col_keys = set(self._column_keys(norm_label))
+            matched_cols = {norm_pred[0][i] for i, key in enumerate(self._column_keys(norm_pred)) if key in label_col_keys}
+            surplus_cols = set(norm_pred[0]) - matched_cols
             # breakpoint()
 
-            # check if the surplus column in norm_pred is mentioned in the nl
-            nl_sentences = nl.lower().split('.')
-            nl_sentences_toks = [word_tokenize(sent) for sent in nl_sentences]  # list of lists
-            neg_toks = ['not', 'no', 'without', 'exclude',  'except', 'ignore', 'skip', 'omit']
+            # check if the surplus column in norm_pred is mentioned in the nl, the question is tokenized once
+            nl_sentences_toks = nl_mention_toks(nl)
             for surplus_col in surplus_cols:
-                toks = [t.lower() for t in word_tokenize(surplus_col)]
-                for sent_toks in nl_sentences_toks:
-                    if set(toks).issubset(set(sent_toks)) and not set(sent_toks).intersection(set(neg_toks)):
-                        info.append(f"Surplus column '{surplus_col}' in pred is mentioned in nl.")
-                        return False, None
-                # remove the surplus column from norm_pred
-                norm_pred = np.delete(np.array(norm_pred), np.where(np.array(norm_pred[0]) == surplus_col), axis=1).tolist()
+                toks = col_name_toks(surplus_col)
+                if any(toks <= sent_toks for sent_toks in nl_sentences_toks):
+                    info.append(f"Surplus column '{surplus_col}' in pred is mentioned in nl.")
+                    return False, None
+            # remove the surplus columns from norm_pred in one pass
+            kept = [j for j, col_name in enumerate(norm_pred[0]) if col_name not in surplus_cols]
+            norm_pred = [[row[j] for j in kept] for row in norm_pred]
         return True, norm_pred
 
+    def _column_keys(self, table):
+        """
+        Column-major view of the rows of a table: one tuple per column, cells compared as strings
+        like the rows of `np.array(table)` would be.
+        """
+        rows = table[1:]
+        return [tuple(str(row[j]) for row in rows) for j in range(len(table[0]))]
+
     def check_rows(self, norm_pred, norm_label, info):
         if len(norm_pred) > len(norm_label):
             info.append(f"Number of pred rows is larger than number of gt rows: {len(norm_pred)} vs {len(norm_label)}. The model may forget LIMIT.")
             return False
         return True
 
-    def eval_exec_match(self, pred_table, label_table, nl, compare_header=False):
+    def quick_exec_match(self, pred_table, label_table, compare_header=False, check_mismatch=True) -> Tuple[Optional[bool], Any, Any]:
+        """
+        O(rows) check of the execution match, before sorting and normalizing the tables.
+        Return (True, pred, label) for a certain match, with label columns aligned to pred,
+        (False, None, None) for a certain mismatch, and (None, None, None) when only the full comparison can tell.
+        The row hashing that detects mismatches of same shape tables is skipped without `check_mismatch`.
+        """
+        if not pred_table or not label_table or not pred_table[0] or not label_table[0]:
+            return None, None, None
+        n_cols, n_rows = len(pred_table[0]), len(pred_table)
+        # too few columns or too many rows always fail `check_columns` / `check_rows`
+        if n_cols < len(label_table[0]) or n_rows > len(label_table):
+            return False, None, None
+        if n_cols != len(label_table[0]) or n_rows != len(label_table) \
+                or any(len(row) != n_cols for table in (pred_table, label_table) for row in table):
+            return None, None, None
+        # a certain match: one-to-one column alignment by value set like `normalize_tables`, then the same rows
+        score, aligned_label = self._quick_align(pred_table, label_table, compare_header)
+        if score:
+            return True, pred_table, aligned_label
+        # same shape: a match needs the same rows, up to the row and column order
+        if check_mismatch and rows_hash(pred_table[1:]) != rows_hash(label_table[1:]):
+            return False, None, None
+        return None, None, None
+
+    def _quick_align(self, pred_table, label_table, compare_header):
+        n_cols = len(pred_table[0])
+        if compare_header or len(set(pred_table[0])) < n_cols or len(set(label_table[0])) < n_cols \
+                or not all(type(cell) is str for table in (pred_table, label_table) for row in table[1:] for cell in row):
+            return False, None
+        def fingerprints(table):
+            return [frozenset(row[i].strip() if i == 0 else row[i] for row in table[1:]) for i in range(n_cols)]
+        label_positions = {values: j for j, values in enumerate(fingerprints(label_table))}
+        try:
+            order = [label_positions[values] for values in fingerprints(pred_table)]
+        except KeyError:
+            return False, None
+        if len(label_positions) < n_cols or len(set(order)) < n_cols:
+            return False, None
+        aligned_label = [[row[j] for j in order] for row in label_table]
+        # string cells: equal rows have equal `str(row)`, they are sorted and compared the same by the full comparison
+        return Counter(map(tuple, pred_table[1:])) == Counter(map(tuple, aligned_label[1:])), aligned_label
+
+    @trace.timed('exec')
+    def eval_exec_match(self, pred_table, label_table, nl, compare_header=False, need_diff=True):
         """
         return 1 if the values between prediction and gold are matching
         in the corresponding index. Currently not support multiple col_unit(pairs).
+        A clear match is settled by `quick_exec_match` without normalizing the tables,
+        a clear mismatch too unless `need_diff`, i.e. the normalized tables are wanted for the report.
+        Without `need_diff`, a settled result returns None for both tables.
         """
         # breakpoint()
         info = []   # contains helpful normalization and evaluating notes
+        # lazy tables (e.g. `utils.result_store.CachedTable`) are read in several passes below, decode their rows once
+        if pred_table is not None and not isinstance(pred_table, list): pred_table = list(pred_table)
+        if label_table is not None and not isinstance(label_table, list): label_table = list(label_table)
+        quick_score, quick_pred, quick_label = self.quick_exec_match(pred_table, label_table, compare_header,
+                                                                             check_mismatch=not need_diff)
+        if trace.ENABLED:
+            trace.event('exec', 'quick_match', score=quick_score)
+        if quick_score is not None and not need_diff:
+            return quick_score, None, None, info
+        if quick_score:
+            # the rows sorted like `normalize_tables`, the tables are reported as the full comparison would
+            return True, quick_pred[:1] + sorted(quick_pred[1:], key=str), \
+                quick_label[:1] + sorted(quick_label[1:], key=str), info
         # norm_pred = self.normalize_table(pred_table)
         # norm_label = self.normalize_table(label_table)
         if not pred_table: pred_table = [[]]
@@ -201,7 +299,8 @@ class Evaluator(SqlVisitor):
         norm_tables = self.normalize_tables({'gt_res': label_table, 'pred_res': pred_table})
         norm_pred, norm_label = norm_tables['norm_pred'], norm_tables['norm_gt']
         # breakpoint()
-        logger.debug(f"norm_pred: {norm_pred}, norm_label: {norm_label}")
+        if trace.ENABLED:
+            trace.event('exec', 'normalized', norm_pred=norm_pred, norm_label=norm_label)
         if len(norm_pred) == 0 and len(norm_label) == 0:
             return True, norm_pred, norm_label, info
         if len(norm_pred) == 0 or len(norm_label) == 0:
@@ -232,6 +331,13 @@ class Evaluator(SqlVisitor):
             'f1': f1
         }
 
+    def count_matches(self, gt_items: Iterable, pred_items: Iterable) -> int:
+        """
+        Number of items matched between gt and pred, as the size of their multiset intersection.
+        Linear in the number of items, and a duplicated pred item only matches as many gt copies as there are.
+        """
+        return sum((Counter(gt_items) & Counter(pred_items)).values())
+
     def extract_table_and_conds(self, join: Join):
         return join.table_unit, join.on_condition
 
@@ -267,10 +373,7 @@ class Evaluator(SqlVisitor):
         pred_total = len(node2.col_units)
 
         # recall - actually true / total predicted
-        actual_true = 0
-        for col_unit in node1.col_units:
-            if col_unit in node2.col_units:
-                actual_true += 1
+        actual_true = self.count_matches(node1.col_units, node2.col_units)
 
         score_dict = self.calculate_scores(actual_true, gt_total, pred_total)
 
@@ -309,10 +412,7 @@ class Evaluator(SqlVisitor):
         gt_sql = [node for node in gt_tables if node.type == 'sql']
 
         # for TableRefs, compare 2 tables
-        actual_true = 0
-        for table in pred_table_refs:
-            if table in gt_table_refs:
-                actual_true += 1
+        actual_true = self.count_matches(gt_table_refs, pred_table_refs)
 
         # for Sqls, calculate score for each pair of Sqls -> return the max score
         if len(pred_sql) > 0 and len(gt_sql) > 0:
@@ -327,10 +427,7 @@ class Evaluator(SqlVisitor):
         table_scores = self.calculate_scores(actual_true, gt_total, pred_total)
 
         # evaluate conds
-        actual_true = 0
-        for cond in pred_conds:
-            if cond in gt_conds:
-                actual_true += 1
+        actual_true = self.count_matches(gt_conds, pred_conds)
 
         gt_total, pred_total = len(gt_conds), len(pred_conds)
         conds_scores = self.calculate_scores(actual_true, gt_total, pred_total)
@@ -351,17 +448,15 @@ class Evaluator(SqlVisitor):
     def visit_Where_Where(self, node1: Where, node2: Where):
         if not node1 or not node2:
             return 0, 0, 0, 0, 0
-        print(f"In visit where: {node1.conds}, {node2.conds}")
+        if trace.ENABLED:
+            trace.event('match', 'where', gt_conds=node1.conds, pred_conds=node2.conds)
         assert node1.conds is not None and node2.conds is not None, "Where nodes must have conds"
         if len(node1.conds) == 0 and len(node2.conds) == 0:
             return {'acc': 1, 'rec': 1, 'prec': 1, 'f1': 1}, True
 
         gt_total, pred_total = len(node1.conds), len(node2.conds)
 
-        actual_true = 0
-        for cond in node1.conds:
-            if cond in node2.conds:
-                actual_true += 1
+        actual_true = self.count_matches(node1.conds, node2.conds)
 
         scores = self.calculate_scores(actual_true, gt_total, pred_total)
         return scores, scores['acc'] == 1
@@ -375,10 +470,7 @@ class Evaluator(SqlVisitor):
 
         gt_total, pred_total = len(node1.order_cols), len(node2.order_cols)
 
-        actual_true = 0
-        for order_col in node1.order_cols:
-            if order_col in node2.order_cols:
-                actual_true += 1
+        actual_true = self.count_matches(node1.order_cols, node2.order_cols)
 
         scores = self.calculate_scores(actual_true, gt_total, pred_total)
         return scores, scores['acc'] == 1
@@ -392,10 +484,7 @@ class Evaluator(SqlVisitor):
 
         gt_total, pred_total = len(node1.col_units), len(node2.col_units)
 
-        actual_true = 0
-        for group_col in node1.col_units:
-            if group_col in node2.col_units:
-                actual_true += 1
+        actual_true = self.count_matches(node1.col_units, node2.col_units)
 
         scores = self.calculate_scores(actual_true, gt_total, pred_total)
         return scores, scores['acc'] == 1
@@ -409,10 +498,7 @@ class Evaluator(SqlVisitor):
 
         gt_total, pred_total = len(node1.conds), len(node2.conds)
 
-        actual_true = 0
-        for cond in node1.conds:
-            if cond in node2.conds:
-                actual_true += 1
+        actual_true = self.count_matches(node1.conds, node2.conds)
 
         scores = self.calculate_scores(actual_true, gt_total, pred_total)
         return scores, scores['acc'] == 1
@@ -1,161 +1,135 @@
-from nltk.tokenize import word_tokenize
+import re
+from array import array
 from utils.schema import Schema
+from utils import trace
 from utils.constants import *
 from copy import deepcopy
 
+# token kinds emitted by the scanner
+KW, ID, STRING, NUMBER, OP = 'kw', 'id', 'string', 'number', 'op'
+
+# single-pass SQL scanner, alternatives are tried in order at each position
+_NAME_PART = r'(?:"[^"]*"|\'[^\']*\'|\w+)'
+_TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<number>\d+(?:\.\d+)?(?![\w.]))                      # 12, 3.5
+      | (?P<name>{part}(?:\.{part})*(?:\.\*)?)                  # keyword, name, "quoted"."name", t.*, 'value'
+      | (?P<op>!=|>=|<=|\|\||[=<>!+\-*/%(),;])                   # operators and punctuation
+      | (?P<other>\S)                                           # anything else, one char at a time
+    )'''.format(part=_NAME_PART), re.VERBOSE)
+
+def _is_quoted(part: str) -> bool:
+    return len(part) >= 2 and part[0] == part[-1] and part[0] in ('"', "'")
+
+def _code_of(tok: str, kind: str) -> int:
+    if kind == STRING:
+        return STRING_CODE
+    if kind == NUMBER:
+        return NUMBER_CODE
+    return TOKEN_CODES.get(tok, ID_CODE)
+
 class Lexer:
     def __init__(self, string, schema: Schema = None):
         self._string = string
         self._schema = schema
-        self._type_dict = []
+        self._kinds = []
+        self._codes = array('B')
+        self._next_clause = array('i')
         self._toks = self.tokenize()
-        self._alias_tables = self.scan_alias()
-        print(f"After tokenization and scanning alias: {self._toks}, {self._alias_tables}")
-        print(f"Schema: {self._schema.idMap}")
+        if trace.ENABLED:
+            trace.event('lex', 'tokens', toks=self._toks)
 
     @property
     def toks(self):
         return self._toks
 
+    @property
+    def kinds(self):
+        """Kind of each token emitted by the scanner: 'kw', 'id', 'string', 'number' or 'op'."""
+        return self._kinds
+
+    @property
+    def codes(self):
+        """Interned code of each token (see `TOKEN_CODES`), parallel to `toks`, used by the parser for dispatch."""
+        return self._codes
+
+    @property
+    def next_clause(self):
+        """For each token, the index of the first clause keyword at or after it at the same nesting depth,
+        len(toks) if the enclosing block (or the query) ends first."""
+        return self._next_clause
+
+    @trace.timed('lex')
     def tokenize(self):
         """
-        Tokenize the input SQL string, preserving quoted strings as single tokens and handling operators like !=, >=, <=.
-        Returns a list of tokens (all lowercased, except quoted strings).
+        Tokenize the input SQL string in one linear pass over a precompiled regex.
+        - keywords and names are lowercased, dotted names are kept as one token and
+          quoted parts of a dotted name are unquoted, e.g. "car_retails"."Employees" -> car_retails.Employees
+        - quoted values are kept as one token with double quotes, e.g. 'New York' -> "New York"
+        - !=, >=, <= are single tokens, and the schema name prefix is removed from names
+        Returns a list of tokens, and fills the kind and code of each token in `self._kinds` and `self._codes`.
         """
         s = str(self._string)
-        s = s.replace("'", '"')  # unify quotes
-        quote_idxs = [idx for idx, char in enumerate(s) if char == '"']
-        assert len(quote_idxs) % 2 == 0, "Unexpected quote"
-
-        vals = {}
-        s_work = s
-
-        # handle quotes (heuristic):
-        # - elimiate quotes for single word values (handle column/table names with quotes)
-        # - otherwise, handle all words in quotes as single token
-        for i in range(len(quote_idxs) - 1, 0, -2):
-            qidx1 = quote_idxs[i-1]
-            qidx2 = quote_idxs[i]
-            val = s[qidx1:qidx2+1]
-            key = f"__val_{qidx1}_{qidx2}__"
-            s_work = s_work[:qidx1] + key + s_work[qidx2+1:]
-            vals[key] = val
-            print(f"Extracted value: {val} as key: {key}")
-
-        # tokenize (lowercase except for value placeholders)
-        print(f"Vals: {vals}")
-        print(f"Keywords: {KEYWORDS}")
-        toks = [word.lower() for word in word_tokenize(s_work)]
-        for i, tok in enumerate(toks):
-            if tok in vals:
-                toks[i] = vals[tok]  # restore quoted value
-                print(f"Tokenized: {tok} -> {toks[i]}")
-            else:
-                # __val1__.__val2__" -> compare if each part is in vals
-                if '.' in tok:
-                    parts = tok.split('.')
-                    for j, part in enumerate(parts):
-                        if part in vals:
-                            parts[j] = vals[part][1:-1]  # remove quotes from value
-                    toks[i] = '.'.join(parts)
-                    print(f"Tokenized: {tok} -> {toks[i]}")
-
-        # merge operators (!=, >=, <=)
-        i = 1
-        while i < len(toks):
-            if toks[i] == '=' and toks[i-1] in ('!', '>', '<'):
-                toks[i-1] = toks[i-1] + '='
-                del toks[i]
-            # if the token starts with schema name, remove it
-            elif toks[i].startswith(f"{self._schema._name.lower()}."):
-                toks[i] = toks[i].split('.', 1)[1]
-                i += 1
+        schema_prefix = f"{self._schema._name.lower()}." if self._schema is not None else None
+
+        toks, kinds = [], []
+        minus_end = -1     # end position of a '-' that may be the sign of the next number
+        for m in _TOKEN_RE.finditer(s):
+            kind = m.lastgroup
+            if kind is None:    # trailing whitespace
+                continue
+            tok = m.group(kind)
+            if kind == 'number':
+                if minus_end == m.start(kind):  # unary minus, e.g. `= -1`
+                    toks.pop()
+                    kinds.pop()
+                    tok = '-' + tok
+                kind = NUMBER
+            elif kind == 'name':
+                parts = re.findall(_NAME_PART + r'|\*', tok)
+                if len(parts) == 1 and _is_quoted(tok):
+                    tok, kind = '"' + tok[1:-1] + '"', STRING
+                else:
+                    tok = '.'.join(part[1:-1] if _is_quoted(part) else part.lower() for part in parts)
+                    if schema_prefix and tok.startswith(schema_prefix):
+                        tok = tok[len(schema_prefix):]
+                    kind = KW if tok in KEYWORDS else ID
+            elif kind == 'op':
+                kind = OP
             else:
-                i += 1
+                assert tok not in ('"', "'"), "Unexpected quote"
+                kind = ID
 
-        for tok in toks:
-            if tok in KEYWORDS:
-                self._type_dict.append('kw')
-            else:
-                self._type_dict.append('id')
-        print(f"Tokens after tokenized: {toks}")
+            # a '-' right after a value or a name is binary, otherwise it may be a sign
+            minus_end = m.end() if tok == '-' and (not kinds or kinds[-1] in (KW, OP) and toks[-1] != ')') else -1
+            toks.append(tok)
+            kinds.append(kind)
 
+        self._kinds = kinds
+        self._codes = array('B', (_code_of(tok, kind) for tok, kind in zip(toks, kinds)))
+        self._build_next_clause(toks)
         return toks
 
-    def scan_alias(self):
-        '''
-        Create a dict with alias as key and table/column name as value
-        e.g. {'c': 'city', 'co': 'country', ...}
-        TODO: Only table alias is used downstream, should we remove column alias?
-        '''
-        alias = {}
-        print(f"Tokens: {self.toks}")
-        print(f"Type dict: {self._type_dict}")
-
-        for idx in range(len(self.toks) - 2, -1, -1):
-            if (self.toks[idx] == 'as'
-                and self.toks[idx-1] not in (',')
-                and self.toks[idx+1] not in (',')):
-                # breakpoint()
-                if self.toks[idx-1] == ')':  # aggregation as alias
-                    # find the matching '(' - there are possibly multiple '('
-                    # e.g. `sum((priceforeach*quantity)) as foo`
-                    match = -1
-                    last_paren_idx = 0
-                    for i in range(idx-2, -1, -1):
-                        if self.toks[i] == '(':
-                            match += 1
-                        elif self.toks[i] == ')':
-                            match -= 1
-                        if match == 0:
-                            last_paren_idx = i
-                            break
-                    agg_op = self.toks[last_paren_idx-1]
-                    # breakpoint()
-                    alias[self.toks[idx+1]] = agg_op
-                else:
-                    print(f"Found alias: {self.toks[idx+1]} -> {self.toks[idx-1]}")
-                    # remove quotes from alias/table names
-                    self.toks[idx-1] = self._check_quote_in_name(self.toks[idx-1])
-                    self.toks[idx+1] = self._check_quote_in_name(self.toks[idx+1])
-                    # add alias to dict
-                    alias[self.toks[idx+1]] = self.toks[idx-1]
-
-            if (self._type_dict[idx] == self._type_dict[idx + 1] == 'id'
-                and self.toks[idx]   not in ('(', ')', ',')
-                and self.toks[idx+1] not in ('(', ')', ',')):
-                self.toks[idx] = self._check_quote_in_name(self.toks[idx])
-                self.toks[idx + 1] = self._check_quote_in_name(self.toks[idx + 1])
-                # add alias to dict
-                alias[self.toks[idx + 1]] = self.toks[idx]
-
-                print(f"Removing alias: {self.toks[idx+1]} -> {self.toks[idx]}")
-                self.toks.pop(idx + 1)
-                self._type_dict.pop(idx + 1)
-        return alias
-
-    def get_merged_alias_table(self, schema: Schema) -> dict:
-        """ Merge detected alias with real table names so every alias found downstream can be resolved via
-        `merged_alias_table[alias]`.
-
-        :returns: dict with alias as key and table/column name as value
+    def _build_next_clause(self, toks):
         """
-        for key in schema.schema_dict:
-            assert key not in self._alias_tables, "Alias {} has the same name in table".format(key)
-            self._alias_tables[key] = key
-
-        # remove quotes from alias names
-        for idx, tok in enumerate(self.toks):
-            # breakpoint() if tok in self._alias_tables.keys() else None
-            if tok in self._alias_tables and (tok[0] == tok[-1] == '"' or tok[0] == tok[-1] == "'"):
-                new_key = tok[1:-1]
-                self._alias_tables[new_key] = self._alias_tables.pop(tok)
-                self.toks[idx] = new_key
-        print(f"Alias tables after merging: {self._alias_tables}")
-        return self._alias_tables
-
-    def _check_quote_in_name(self, name: str) -> str:
-        """ Check if the name has quotes and remove them if so. """
-        if (name.startswith('"') and name.endswith('"')) or (name.startswith("'") and name.endswith("'")):
-            return name[1:-1]
-        return name
\ No newline at end of file
+        Precompute `next_clause` in one backward pass, so the parser can jump to the
+        next clause in O(1) instead of scanning tokens.
+        """
+        codes = self._codes
+        n = len(toks)
+        lparen, rparen = TOKEN_CODES['('], TOKEN_CODES[')']
+        next_clause = array('i', [n]) * n
+        next_at_depth = [n]     # next clause keyword index, one entry per nesting depth
+        for i in range(n - 1, -1, -1):
+            code = codes[i]
+            if code == rparen:
+                next_at_depth.append(n)     # nothing follows inside the block
+            elif code == lparen:
+                if len(next_at_depth) > 1:  # an unbalanced '(' does not close a block
+                    next_at_depth.pop()
+                next_clause[i] = next_at_depth[-1]
+            else:
+                if code in CLAUSE_CODES:
+                    next_at_depth[-1] = i
+                next_clause[i] = next_at_depth[-1]
+        self._next_clause = next_clause
@@ -2,7 +2,13 @@ from typing import Dict, List, Union, Tuple
 from enum import Enum
 from utils.constants import *
 
+# Nodes use __slots__ to keep parsed queries small. Nodes defining __eq__ also define a
+# structural __hash__ consistent with it, so they can be used in sets, dicts and Counters.
+# Nodes without __eq__ (Select, From, Sql, ...) compare and hash by identity.
+
 class TableUnit:
+    __slots__ = ('type',)
+
     def __init__(self, type_):
         self.type = type_
 
@@ -10,6 +16,8 @@ class TableUnit:
         return f"TableUnit(type={self.type})"
 
 class ColUnit:
+    __slots__ = ('is_distinct',)
+
     def __init__(self, is_distinct):
         self.is_distinct = is_distinct
 
@@ -17,14 +25,56 @@ class ColUnit:
         return f"ColUnit(distinct={self.is_distinct})"
 
 class Select:
-    def __init__(self, col_units: List[ColUnit]=[]):
+    __slots__ = ('col_units', 'is_distinct')
+
+    def __init__(self, col_units: List[ColUnit]=[], is_distinct=False):
         self.col_units = col_units
+        self.is_distinct = is_distinct
 
     def __str__(self):
         return f"Select(col_units=[{', '.join(str(cu) for cu in self.col_units)}])"
 
+def _order_key(unit) -> tuple:
+    """Deterministic sort key consistent with the nodes' __eq__, used to order the two sides of a Cond."""
+    if isinstance(unit, ColRef):
+        return ('ColRef', str(unit.col_id), unit.is_distinct)
+    if isinstance(unit, Agg):
+        return ('Agg', unit.agg_id, _order_key(unit.col_unit), unit.is_distinct)
+    if isinstance(unit, Arith):
+        return ('Arith', unit.unit_op, _order_key(unit.col_unit1), _order_key(unit.col_unit2), unit.is_distinct)
+    return (type(unit).__name__, str(unit))
+
+# op_id -> op_id of the same comparison with its sides swapped, e.g. a < b  <=>  b > a
+_FLIPPED_OPS = {
+    WHERE_OPS.index(op): WHERE_OPS.index(flipped)
+    for op, flipped in (('=', '='), ('!=', '!='), ('<', '>'), ('>', '<'), ('<=', '>='), ('>=', '<='))
+}
+# op_id -> op_id of its negation, e.g. NOT a >= b  <=>  a < b
+_NEGATED_OPS = {
+    WHERE_OPS.index(op): WHERE_OPS.index(negated)
+    for op, negated in (('=', '!='), ('!=', '='), ('<', '>='), ('>=', '<'), ('>', '<='), ('<=', '>'))
+}
+
 class Cond:
+    """
+    A condition, normalized once at construction so that equivalent conditions are equal:
+    - NOT is pushed into comparison operators, e.g. NOT a >= 5 -> a < 5
+    - the column side comes first, and when both sides are columns they are put in a fixed
+      order with the operator flipped accordingly, e.g. b > a -> a < b
+    Equality and hashing then compare the normalized fields as a tuple.
+    """
+    __slots__ = ('not_op', 'op_id', 'col_unit', 'val1', 'val2')
+
     def __init__(self, not_op, op_id, col_unit, val1, val2):
+        if not_op and op_id in _NEGATED_OPS:
+            not_op, op_id = False, _NEGATED_OPS[op_id]
+        if op_id in _FLIPPED_OPS and val2 is None and isinstance(val1, ValueUnit):
+            if isinstance(col_unit, ValueUnit) and col_unit.type != 'col' and val1.type == 'col':
+                # value on the left, e.g. 5 < a -> a > 5
+                col_unit, val1, op_id = val1.value, col_unit, _FLIPPED_OPS[op_id]
+            elif (isinstance(col_unit, ColUnit) and val1.type == 'col'
+                  and _order_key(val1.value) < _order_key(col_unit)):
+                col_unit, val1, op_id = val1.value, ValueUnit('col', col_unit), _FLIPPED_OPS[op_id]
         self.not_op = not_op
         self.op_id = op_id
         self.col_unit = col_unit
@@ -35,47 +85,20 @@ class Cond:
         not_str = "NOT " if self.not_op else ""
         return f"Cond(not_op={self.not_op}, op_id={self.op_id}, col_unit={self.col_unit}, val1={self.val1}, val2={self.val2})"
 
+    def _key(self) -> tuple:
+        return (self.not_op, self.op_id, self.col_unit, self.val1, self.val2)
+
     def __eq__(self, other):
         if not isinstance(other, Cond):
             return False
-        else:
-            # issue ['=', '>', '<', '>=', '<='] - only when col_unit and val1 are of same types
-            if type(self.col_unit) != type(self.val1):
-                return (self.not_op == other.not_op
-                        and self.op_id == other.op_id
-                        and self.col_unit == other.col_unit
-                        and self.val1 == other.val1)
-            if type(other.col_unit) != type(other.val1):
-                return False
-
-            equal_op = WHERE_OPS.index('=')
-            lt, gt = WHERE_OPS.index('<'), WHERE_OPS.index('>')
-            lte, gte = WHERE_OPS.index('<='), WHERE_OPS.index('>=')
-
-            if self.op_id == other.op_id == equal_op:
-                return (self.val1 == other.val1 and self.val2 == other.val2
-                        or self.val1 == other.val2 and self.val2 == other.val1)
-
-            if self.op_id == lt:
-                return (self.not_op == other.not_op and other.op_id == gt and self.val1 == other.val2 and self.val2 == other.val1
-                        or self.not_op != other.not_op and other.op_id == gte and self.val1 == other.val1 and self.val2 == other.val2
-                        or self.not_op != other.not_op and other.op_id == lte and self.val1 == other.val2 and self.val2 == other.val1)
-
-            if self.op_id == gt:
-                return (self.not_op == other.not_op and other.op_id == lt and self.val1 == other.val2 and self.val2 == other.val1
-                        or self.not_op != other.not_op and other.op_id == lte and self.val1 == other.val1 and self.val2 == other.val2
-                        or self.not_op != other.not_op and other.op_id == gte and self.val1 == other.val2 and self.val2 == other.val1)
-
-            if self.op_id == lte:
-                return (self.not_op == other.not_op and other.op_id == gte and self.val1 == other.val2 and self.val2 == other.val1
-                        or self.not_op != other.not_op and other.op_id == gt and self.val1 == other.val1 and self.val2 == other.val2
-                        or self.not_op != other.not_op and other.op_id == lt and self.val1 == other.val2 and self.val2 == other.val1)
-
-            if self.op_id == gte:
-                return (self.not_op == other.not_op and other.op_id == lte and self.val1 == other.val2 and self.val2 == other.val1
-                        or self.not_op != other.not_op and other.op_id == lt and self.val1 == other.val1 and self.val2 == other.val2
-                        or self.not_op != other.not_op and other.op_id == gt and self.val1 == other.val2 and self.val2 == other.val1)
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(('Cond',) + self._key())
+
 class Join:
+    __slots__ = ('join_type', 'table_unit', 'on_condition')
+
     def __init__(self, join_type, table_unit, on_condition: List[Cond]):
         self.join_type = join_type
         self.table_unit = table_unit
@@ -86,6 +109,8 @@ class Join:
         return f"Join(join_type={self.join_type}, table_unit={self.table_unit}, on_condition=[{conds}])"
 
 class TableRef(TableUnit):
+    __slots__ = ('id', 'name')
+
     def __init__(self, id, name=None):
         super().__init__('table')
         self.id = id
@@ -100,8 +125,14 @@ class TableRef(TableUnit):
         else:
             return (self.id == other.id
                     and self.type == other.type)
+
+    def __hash__(self):
+        return hash(('TableRef', self.id, self.type))
+
 class From:
     '''Table unit and list (possibly empty) of Joins'''
+    __slots__ = ('table_unit', 'joins')
+
     def __init__(self, table_unit: TableUnit=None, joins: List[Join]=[]):
         self.table_unit = table_unit
         self.joins = joins
@@ -111,6 +142,8 @@ class From:
         return f"From(table_unit={self.table_unit}, joins=[{joins_str}])"
 
 class Where:
+    __slots__ = ('conds',)
+
     def __init__(self, conds: List[Cond]=[]):
         self.conds = conds
 
@@ -118,6 +151,8 @@ class Where:
         return f"Where(conds=[{', '.join(str(cond) for cond in self.conds)}])"
 
 class GroupBy:
+    __slots__ = ('col_units',)
+
     def __init__(self, col_units: List[ColUnit]=[]):
         self.col_units = col_units
 
@@ -125,6 +160,8 @@ class GroupBy:
         return f"GroupBy(col_units=[{', '.join(str(cu) for cu in self.col_units)}])"
 
 class Having:
+    __slots__ = ('conds',)
+
     def __init__(self, conds: List[Cond]=[]):
         self.conds = conds
 
@@ -132,6 +169,8 @@ class Having:
         return f"Having(conds=[{', '.join(str(cond) for cond in self.conds)}])"
 
 class OrderBy:
+    __slots__ = ('order_cols',)
+
     def __init__(self, order_cols: List[Tuple[ColUnit, str]]=[]):
         self.order_cols = order_cols
 
@@ -139,6 +178,8 @@ class OrderBy:
         return f"OrderBy(order_cols=[{', '.join(f'{col} {order}' for col, order in self.order_cols)}])"
 
 class Limit():
+    __slots__ = ('value',)
+
     def __init__(self, value=None):
         self.value = value
 
@@ -150,8 +191,13 @@ class Limit():
             return False
         else:
             return (self.value == other.value)
+
+    def __hash__(self):
+        return hash(('Limit', self.value))
         
 class Sql(TableUnit):
+    __slots__ = ('select', 'from_', 'where', 'group_by', 'having', 'order_by', 'limit', 'intersect', 'union', 'except_')
+
     def __init__(
             self,
             type_: str = 'sql',
@@ -188,6 +234,8 @@ class Sql(TableUnit):
         return '\n'.join([p for p in parts if p])
 
 class ValueUnit:
+    __slots__ = ('type', 'value')
+
     def __init__(self, type, value):
         self.type = type
         self.value = value
@@ -200,7 +248,13 @@ class ValueUnit:
             return False
         else:
             return (self.type == other.type and self.value == other.value)
+
+    def __hash__(self):
+        return hash(('ValueUnit', self.type, self.value))
+
 class ColRef(ColUnit):
+    __slots__ = ('col_id', 'col_name')
+
     def __init__(self, col_id, col_name, is_distinct=False):
         super().__init__(is_distinct)
         self.col_id = col_id
@@ -214,7 +268,13 @@ class ColRef(ColUnit):
             return False
         else:
             return (self.col_id == other.col_id and self.is_distinct == other.is_distinct)
+
+    def __hash__(self):
+        return hash(('ColRef', self.col_id, self.is_distinct))
+
 class Arith (ColUnit):
+    __slots__ = ('unit_op', 'col_unit1', 'col_unit2')
+
     def __init__(self, unit_op, col_unit1: ColUnit, col_unit2: ColUnit, is_distinct=False):
         super().__init__(is_distinct)
         self.unit_op = unit_op
@@ -232,7 +292,13 @@ class Arith (ColUnit):
                     and self.col_unit1 == other.col_unit1
                     and self.col_unit2 == other.col_unit2
                     and self.is_distinct == other.is_distinct)
+
+    def __hash__(self):
+        return hash(('Arith', self.unit_op, self.col_unit1, self.col_unit2, self.is_distinct))
+
 class Agg (ColUnit):
+    __slots__ = ('agg_id', 'col_unit')
+
     def __init__(self, agg_id, col_unit, is_distinct=False):
         ColUnit.__init__(self, is_distinct)
         self.agg_id = agg_id
@@ -246,5 +312,8 @@ class Agg (ColUnit):
                     and self.col_unit == other.col_unit
                     and self.is_distinct == other.is_distinct)
 
+    def __hash__(self):
+        return hash(('Agg', self.agg_id, self.col_unit, self.is_distinct))
+
     def __str__(self):
         return f"Agg(agg_id={self.agg_id}, col_unit={self.col_unit}, distinct={self.is_distinct})"
\ No newline at end of file
@@ -1,11 +1,46 @@
 from lexer import Lexer
 from utils.schema import Schema
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 from utils.constants import *
+from utils import trace
 from .nodes import *
-import logging
 
-logger = logging.getLogger(__name__)
+# token codes that end a clause's item list / a condition list
+CLAUSE_END_CODES = CLAUSE_CODES | token_codes(')', ';') | {END_CODE}
+COND_END_CODES = CLAUSE_CODES | JOIN_CODES | token_codes(')', ';')
+
+def _unquote(name: str) -> str:
+    """Remove the quotes around a name, e.g. a quoted alias `"p"` -> `p`."""
+    if len(name) >= 2 and name[0] == name[-1] and name[0] in ('"', "'"):
+        return name[1:-1]
+    return name
+
+class Scope:
+    """
+    Aliases bound in one (sub)query: table aliases from its FROM/JOIN clauses and
+    column aliases from its SELECT clause. Lookups fall back to the enclosing query's
+    scope, so a correlated subquery can refer to the aliases of its outer query.
+    """
+    def __init__(self, parent: Optional['Scope'] = None):
+        self.parent = parent
+        self.tables: Dict[str, str] = {}        # alias -> table name
+        self.columns: Dict[str, ColUnit] = {}   # alias -> selected column unit
+
+    def table(self, alias: str) -> Optional[str]:
+        scope = self
+        while scope is not None:
+            if alias in scope.tables:
+                return scope.tables[alias]
+            scope = scope.parent
+        return None
+
+    def column(self, alias: str) -> Optional[ColUnit]:
+        scope = self
+        while scope is not None:
+            if alias in scope.columns:
+                return scope.columns[alias]
+            scope = scope.parent
+        return None
 
 class Parser:
     def __init__(
@@ -15,11 +50,14 @@ class Parser:
     ):
         self._lexer: Lexer = lexer
         self._schema: Schema = schema
-        self._alias_tables: Dict[str, str] = self._lexer.get_merged_alias_table(self._schema)   # TODO: Can we construct this table on the go? -> reduce 1 pass through the sql string
         self._toks: List[str] = self._lexer.toks
+        self._codes = self._lexer.codes    # token codes parallel to self._toks
+        self._next_clause = self._lexer.next_clause
         self._pos: int = 0
-        self._sql: Sql
+        self._sql: Sql = None
+        self._scope: Scope = None     # aliases of the (sub)query being parsed
 
+    @trace.timed('parse')
     def parse(self):
         """Parse the SQL query from the lexer tokens."""
         sql = self._parse_sql()
@@ -33,6 +71,12 @@ class Parser:
             return self._toks[self._pos + n]
         return None
 
+    def _peek_code(self, n: int = 0) -> int:
+        """Peek at the code of the next token, END_CODE if there is none."""
+        if self._pos + n < len(self._codes):
+            return self._codes[self._pos + n]
+        return END_CODE
+
     def _pop(self):
         """Pop the next token and advance the position."""
         if self._pos < len(self._toks):
@@ -62,12 +106,34 @@ class Parser:
             raise ValueError(f"Expected token '{expected_token}', but found '{self._peek()}'.")
         
     def _find(self, start_idx: int, expected_token: str):
-        """Find the index of the expected token starting from start_idx."""
-        for idx in range(start_idx, len(self._toks)):
+        """Find the index of the clause keyword `expected_token` at the same nesting depth as start_idx,
+        hopping between clause keywords with the lexer's precomputed `next_clause` table."""
+        n = len(self._toks)
+        idx = self._next_clause[start_idx] if start_idx < n else n
+        while idx < n:
             if self._toks[idx] == expected_token:
                 return idx
+            idx = self._next_clause[idx + 1] if idx + 1 < n else n
         return None
                
+    def _parse_alias(self) -> Optional[str]:
+        """Consume an optional `[AS] alias` after a table or a selected column, return the unquoted alias."""
+        if self._peek() == 'as':
+            self._advance()
+            return _unquote(self._pop())
+        if self._peek_code() in (ID_CODE, STRING_CODE):
+            return _unquote(self._pop())
+        return None
+
+    def _resolve_table(self, name: str) -> str:
+        """Resolve a table alias (or a table name) to the real table name."""
+        table = self._scope.table(name)
+        if table is not None:
+            return table
+        if name in self._schema.schema_dict:
+            return name
+        raise KeyError(f"Unknown table or alias: {name}")
+
     def _expect_end(self):
         """Ensure that the parser has reached the end of the tokens."""
         if self._pos != len(self._toks):
@@ -75,13 +141,15 @@ class Parser:
 
     # MAIN METHODS ======================================================
     def _parse_sql(self):
+        # each (sub)query gets its own node and alias scope, restored when it is parsed
+        outer_sql, outer_scope = self._sql, self._scope
         self._sql = Sql()
+        self._scope = Scope(parent=outer_scope)
         isBlock = False
-        select_idx = self._pos  # save the position of 'select'
-
         if self._peek() == '(':  # handle block
             isBlock = True
             self._advance()
+        select_idx = self._pos  # save the position of 'select'
 
         # parse 'from' first to get default_tables
         from_idx = self._find(self._pos, 'from')
@@ -114,11 +182,13 @@ class Parser:
         if isBlock:
             self._consume(')')
 
-        if self._peek() in SQL_OPS:
+        if self._peek_code() in SQL_OP_CODES:
             sql_op = self._pop()
-            IUE_sql = self.parse_sql()
-            setattr(self._sql, sql_op, IUE_sql)
-        return self._sql
+            IUE_sql = self._parse_sql()
+            setattr(self._sql, 'except_' if sql_op == 'except' else sql_op, IUE_sql)
+        sql = self._sql
+        self._sql, self._scope = outer_sql, outer_scope
+        return sql
 
     def parse_from(self) -> From:
         """
@@ -145,7 +215,7 @@ class Parser:
             default_tables.append(table_name)
 
         while True:
-            if self._peek() in ('join', 'inner', 'outer', 'natural', 'left', 'right', ','):
+            if self._peek_code() in JOIN_START_CODES:
                 joins.append(self.parse_join(default_tables))
             else:
                 break
@@ -157,7 +227,7 @@ class Parser:
 
     def parse_join(self, default_tables: List[str]) -> Join:
         # breakpoint()
-        assert self._peek() in ('join', 'inner', 'outer', 'natural', 'left',  'right', ','), "Expected 'join' or ',' keyword"
+        assert self._peek_code() in JOIN_START_CODES, "Expected 'join' or ',' keyword"
         join_type = self._pop()
         join_type = join_type if join_type != ',' else 'decartes'
         if self._peek() == 'join': self._advance()  # skip 'join'
@@ -186,8 +256,8 @@ class Parser:
 
 
     def parse_select(self, default_tables):
-        logger.debug(f"Parsing select statement, current position: {self._pos}, next token: {self._peek()}")
-        logger.debug(f"Clause keywords: {CLAUSE_KEYWORDS}")
+        if trace.ENABLED:
+            trace.event('parse', 'select', pos=self._pos, tok=self._peek())
         select_tok = self._pop()
         assert select_tok == 'select', "'select' not found"
 
@@ -200,35 +270,29 @@ class Parser:
         while True:
             col_unit = self.parse_col_unit(default_tables)
             col_units.append(col_unit)
+            alias = self._parse_alias()
+            if alias is not None:
+                self._scope.columns[alias] = col_unit
             if self._peek() == ',':
                 self._advance()  # skip ','
-            elif self._peek() == 'as':  # skip 'as id ,'
-                if self._peek(2) == ',':
-                    self._advance(3)
-                else:
-                    self._advance(2)
             else:
                 break
-            if self._peek() in CLAUSE_KEYWORDS or self._peek() in (")", ";", None):
+            if self._peek_code() in CLAUSE_END_CODES:
                 break
 
         return Select(is_distinct=is_distinct, col_units=col_units)
     
     def parse_table_ref(self):
-        """Return table id, table real name, advance the position."""
-        table_name = self._pop()
-
-        # get table real name
-        actual_table_name = self._alias_tables.get(table_name, table_name)
-        
-        # advance the posion if needed
-        if self._peek() == 'as':
-            self._advance(n=2)  # skip 'as' and the alias token
+        """Return table id, table real name, advance the position and bind the table alias if any."""
+        table_name = _unquote(self._pop())
+        alias = self._parse_alias()
+        if alias is not None:
+            self._scope.tables[alias] = table_name
         try:
-            self._schema.idMap[actual_table_name]
+            self._schema.idMap[table_name]
         except:
-            raise Exception(f"Table {actual_table_name} not found in idMap, Schema: {self._schema.idMap}")
-        return TableRef(self._schema.idMap[actual_table_name], actual_table_name), table_name
+            raise Exception(f"Table {table_name} not found in idMap, Schema: {self._schema.idMap}")
+        return TableRef(self._schema.idMap[table_name], table_name), table_name
 
     def parse_condition(self, default_tables) -> List[Cond]:
         '''
@@ -236,7 +300,8 @@ class Parser:
             [condition1, 'and', condition2, 'or', condition3, ...]
             where condition is a tuple of the form: (not_op, op_id, val_unit, val1, val2)
         '''
-        logger.debug(f"In parse_condition, current position: {self._pos}, next token: {self._peek()}")
+        if trace.ENABLED:
+            trace.event('parse', 'condition', pos=self._pos, tok=self._peek())
         conds = []
         # breakpoint()
         while self._pos < len(self._toks):
@@ -247,12 +312,11 @@ class Parser:
                 self._advance()
             
             op_tok = self._peek()
-            assert op_tok in WHERE_OPS, f"Error condition: pos: {self._pos}, tok: {op_tok}"
+            assert self._peek_code() in WHERE_OP_CODES, f"Error condition: pos: {self._pos}, tok: {op_tok}"
             op_id = WHERE_OPS.index(op_tok)
             self._advance()
 
             # breakpoint()
-            print(f"In parse_condition, current position: {self._pos}, next token: {self._peek()}")
             val1 = val2 = None
             if op_id == WHERE_OPS.index('between'):
                 val1 = self.parse_value(default_tables)
@@ -265,11 +329,11 @@ class Parser:
             conds.append(Cond(not_op, op_id, col_unit, val1, val2))     # append the condition tuple
 
             # check for clause/join/ending
-            if self._peek() in CLAUSE_KEYWORDS+JOIN_KEYWORDS or self._peek() in (")", ";"):
+            if self._peek_code() in COND_END_CODES:
                 break
 
             # check for AND/OR
-            if self._peek() in COND_OPS:
+            if self._peek_code() in COND_CODES:
                 conds.append(self._pop())   # append the AND/OR operator (connector)
         return conds
     
@@ -280,7 +344,8 @@ class Parser:
         :param default_tables: List of default tables to resolve column names.
         :returns: (unit_op, col_unit1, col_unit2), if unit_op is 'none', the tuple would be (0, col_unit1, None).
         """
-        print(f"In parse_col_unit, current position: {self._pos}, next token: {self._peek()}")
+        if trace.ENABLED:
+            trace.event('parse', 'col_unit', pos=self._pos, tok=self._peek())
         isDistinct = False
         agg = None
         col_unit1, col_unit2, unit_op = None, None, UNIT_OPS.index('none')
@@ -294,13 +359,13 @@ class Parser:
             isDistinct = True
             self._advance()
 
-        if self._peek() in AGG_OPS:
+        if self._peek_code() in AGG_CODES:
             agg = self.parse_agg(default_tables)
 
         else:
             col_unit1 = self.parse_col_ref(default_tables)
 
-        if self._peek() in UNIT_OPS:
+        if self._peek_code() in UNIT_OP_CODES:
             unit_op = UNIT_OPS.index(self._pop())
             col_unit2 = self.parse_col_unit(default_tables)
 
@@ -321,7 +386,8 @@ class Parser:
             :returns column id , column name
         """
         # breakpoint()
-        print(f"In parse_col_ref, current position: {self._pos}, next token: {self._peek()}")
+        if trace.ENABLED:
+            trace.event('parse', 'col_ref', pos=self._pos, tok=self._peek())
         isBlock = False
         if self._peek() == '(':
             isBlock = True
@@ -334,30 +400,23 @@ class Parser:
 
         if '.' in col_tok:  # if token is a composite - e.g. table_a.col_b
             alias, col = col_tok.split('.')
-            key = self._alias_tables[alias] + "." + col
+            key = self._resolve_table(alias) + "." + col
             self._advance()
             return ColRef(self._schema.idMap[key], key)
 
         assert default_tables is not None and len(default_tables) > 0, "Default tables should not be None or empty"
 
-        for alias in default_tables:
-            table = self._alias_tables[alias]
+        for table in default_tables:
             if col_tok in self._schema.schema_dict[table]:   # find in each table's columns
                 key = table + "." + col_tok
                 self._advance()
                 return ColRef(self._schema.idMap[key], key)
 
-        # aggregation, arithmetic ops
-        try:
-            agg_op = self._alias_tables[col_tok]
-            if agg_op in AGG_OPS:
-                self._advance()
-                return ColRef(agg_op, self._schema.idMap[agg_op])
-        except:
-            assert False, "Error col: {}".format(col_tok)
-        
-        if isBlock:
-            self._consume(')')
+        # alias of a selected column, e.g. `ORDER BY total_payment`
+        col_unit = self._scope.column(col_tok)
+        assert col_unit is not None, "Error col: {}".format(col_tok)
+        self._advance()
+        return col_unit
 
     def parse_agg(self, default_tables):
         """
@@ -369,11 +428,15 @@ class Parser:
 
     def parse_value(self, default_tables):
         value_tok = self._peek()
-        logger.debug(f"Current position: {self._pos}, next token: {value_tok}")
+        if trace.ENABLED:
+            trace.event('parse', 'value', pos=self._pos, tok=value_tok)
         # case value is a literal string
         if (value_tok.startswith('"') and value_tok.endswith('"')) or (value_tok.startswith("'") and value_tok.endswith("'")):
             val = self._pop()
             return ValueUnit(type="string", value=val)
+        # case value is a subquery, e.g. `IN (SELECT ...)`
+        if value_tok == '(' and self._peek(1) == 'select':
+            return ValueUnit(type='sql', value=self._parse_sql())
         # case value is a number
         try:
             val = float(self._peek())
@@ -415,7 +478,7 @@ class Parser:
                 self._advance()  # skip ','
             else:
                 break
-            if self._peek() in CLAUSE_KEYWORDS or self._peek() in (")", ";", None):
+            if self._peek_code() in CLAUSE_END_CODES:
                 break
         # only one of col_units or column_group_units should be non-empty
         return GroupBy(col_units)
@@ -435,7 +498,8 @@ class Parser:
         Returns: a tuple (order_type, val_units) where order_type is 'asc' or 'desc',
         and val_units is a list of value units to order by.
         """
-        print(f"In parse_order_by, current position: {self._pos}, next token: {self._peek()}")
+        if trace.ENABLED:
+            trace.event('parse', 'order_by', pos=self._pos, tok=self._peek())
         order_cols = []
 
         if self._peek() != 'order':
@@ -449,30 +513,30 @@ class Parser:
                 next_tok = int(self._peek())
                 self._advance()
                 col_unit = self._sql.select.col_units[next_tok]
-                if self._peek() in ORDER_OPS:
+                if self._peek_code() in ORDER_CODES:
                     order_cols.append((col_unit, self._pop()))
             except ValueError:
                 col_unit = self.parse_col_unit(default_tables)
-                if self._peek() in ORDER_OPS:
+                if self._peek_code() in ORDER_CODES:
                     order_cols.append((col_unit, self._pop()))
                 # breakpoint()
             if self._peek() == ',':
                 self._advance()  # skip ','
             else:
                 break
-            if self._peek() in CLAUSE_KEYWORDS or self._peek() in (")", ";", None):
+            if self._peek_code() in CLAUSE_END_CODES:
                 break
         return OrderBy(order_cols)
 
     def parse_limit(self):
         """
-        :returns: an integer limit value if 'limit' is present, otherwise None.
+        :returns: Limit with an integer value if 'limit' is present, otherwise Limit(None).
         """
         if self._peek() != 'limit':
-            return None
+            return Limit()
         self._advance()  # skip 'limit'
         limit_val = self._pop()
         try:
-            return int(limit_val)
+            return Limit(int(limit_val))
         except ValueError:
             raise ValueError(f"Invalid LIMIT value: {limit_val}")
\ No newline at end of file
@@ -0,0 +1,68 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import yaml
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# benchmark.py logs to ./benchmark.log on import, so it is run in a subprocess from a temporary directory
+EVALUATE_RUN = """
+import json, sys
+import benchmark, evaluator
+from utils import Visualizer
+evaluator.word_tokenize = str.split     # the nltk punkt data may be missing
+benchmark.Visualizer = lambda: Visualizer(root_dir='results')
+summary = benchmark.evaluate(*sys.argv[1:4], {}, *[sys.argv[4]] * 3, workers=int(sys.argv[5]), headless=True,
+                             report_dir='report', need_diff=sys.argv[6] == 'diff')
+print(json.dumps({key: summary[key] for key in ('total', 'total_match', 'eval_err_num')}))
+"""
+
+def run_evaluate(tmp_path, gold_file, workers, need_diff=True):
+    args = [gold_file, os.path.join(REPO_DIR, 'mocked_data', 'tables.json'), 'exec',
+            os.path.join(REPO_DIR, 'tmp', 'tests', 'aqua_benchmark'), str(workers), 'diff' if need_diff else 'no-diff']
+    run = subprocess.run([sys.executable, '-c', EVALUATE_RUN, *args], cwd=tmp_path, capture_output=True, text=True,
+                         env={**os.environ, 'PYTHONPATH': REPO_DIR})
+    assert run.returncode == 0, run.stderr
+    return json.loads(run.stdout.strip().splitlines()[-1])
+
+def test_unknown_db_is_an_eval_error(tmp_path):
+    with open(os.path.join(REPO_DIR, 'aqua_benchmark_dataset.yml'), encoding='utf-8') as f:
+        dataset = yaml.safe_load(f)
+    dataset['test_cases'][0]['dataset_id'] = 'no_such_db'
+    gold_file = str(tmp_path / 'dataset.yml')
+    with open(gold_file, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(dataset, f)
+    outputs = [run_evaluate(tmp_path, gold_file, workers) for workers in (1, 2)]
+    assert outputs[0] == outputs[1]
+    assert outputs[0]['total'] > 1 and outputs[0]['eval_err_num'] == 1
+
+def test_pool_workers_flush_cache_hits(tmp_path):
+    gold_file = os.path.join(REPO_DIR, 'aqua_benchmark_dataset.yml')
+    def last_uses():
+        uses = {}
+        for name in ('parse_cache.sqlite', 'exec_cache.sqlite'):
+            with sqlite3.connect(str(tmp_path / 'evaluate_data' / name)) as conn:
+                uses.update(conn.execute('SELECT key, used FROM entries').fetchall())
+        return uses
+    run_evaluate(tmp_path, gold_file, 2)
+    stored = last_uses()
+    run_evaluate(tmp_path, gold_file, 2)
+    # every entry is hit by the second run, its buffered last use is written when the workers exit
+    assert stored and all(used > stored[key] for key, used in last_uses().items())
+
+def test_no_diff_keeps_the_verdicts(tmp_path):
+    gold_file = os.path.join(REPO_DIR, 'aqua_benchmark_dataset.yml')
+    runs = {}
+    for need_diff in (True, False):
+        run_dir = tmp_path / str(need_diff)
+        run_dir.mkdir()
+        summary = run_evaluate(run_dir, gold_file, 1, need_diff)
+        with open(run_dir / 'report' / 'exec_matching.json', encoding='utf-8') as f:
+            runs[need_diff] = summary, json.load(f)['records']
+    assert runs[True][0] == runs[False][0]
+    assert [r['is_match'] for r in runs[True][1]] == [r['is_match'] for r in runs[False][1]]
+    # results settled by the quick check are reported without normalized tables
+    assert all(r['norm_pred'] is not None for r in runs[True][1])
+    assert any(r['norm_pred'] is None for r in runs[False][1])
@@ -0,0 +1,204 @@
+import gc
+import time
+import pytest
+import evaluator
+from evaluator import Evaluator
+from refactor.nodes import *
+from utils.constants import *
+
+
+def col(i, table='t'):
+    return ColRef(f"__{table}.c{i}__", f"{table}.c{i}")
+
+def cond(i):
+    return Cond(False, WHERE_OPS.index('='), col(i), ValueUnit('number', float(i)), None)
+
+def where_chain(n):
+    conds = []
+    for i in range(n):
+        conds += [cond(i), 'and']
+    return Where(conds[:-1])
+
+def test_count_matches_respects_multiplicity():
+    evaluator = Evaluator()
+    assert evaluator.count_matches([col(1), col(2)], [col(1), col(1), col(1)]) == 1
+    assert evaluator.count_matches([col(1), col(1)], [col(1), col(1), col(2)]) == 2
+
+def test_duplicate_pred_columns_are_not_all_hits():
+    scores, exact = Evaluator().visit(Select([col(1), col(2)]), Select([col(1), col(1)]))
+    assert scores['prec'] == 0.5 and scores['rec'] == 0.5
+    assert not exact
+
+def test_select_order_is_ignored():
+    scores, exact = Evaluator().visit(Select([col(1), col(2), col(3)]), Select([col(3), col(1), col(2)]))
+    assert scores['f1'] == 1 and exact
+
+def test_where_connectors_are_counted():
+    gt = Where([cond(1), 'and', cond(2)])
+    pred = Where([cond(1), 'or', cond(2)])
+    scores, exact = Evaluator().visit(gt, pred)
+    assert scores['prec'] == pytest.approx(2 / 3)
+    assert not exact
+
+def test_normalize_tables_aligns_columns_by_values():
+    gt = [['name', 'city'], ['Ann', 'NYC'], ['Bob', 'Paris']]
+    pred = [['town', 'who', 'extra'], ['Paris', 'Bob', '1'], ['NYC', 'Ann', '2']]
+    tables = Evaluator().normalize_tables({'gt_res': gt, 'pred_res': pred})
+    assert tables['norm_gt'] == [['city', 'name'], ['NYC', 'Ann'], ['Paris', 'Bob']]
+    assert tables['norm_pred'] == [['town', 'who', 'extra'], ['NYC', 'Ann', '2'], ['Paris', 'Bob', '1']]
+
+def test_normalize_tables_does_not_print(capsys):
+    Evaluator().normalize_tables({'gt_res': [['a'], ['1']], 'pred_res': [['a'], ['1']]})
+    assert capsys.readouterr().out == ''
+
+@pytest.fixture
+def split_tokenize(monkeypatch):
+    monkeypatch.setattr(evaluator, 'word_tokenize', str.split)
+    evaluator.nl_mention_toks.cache_clear()
+    evaluator.col_name_toks.cache_clear()
+
+def test_check_columns_drops_unmentioned_surplus(split_tokenize):
+    gt = [['name'], ['Ann'], ['Bob']]
+    pred = [['name', 'id', 'city'], ['Ann', 1, 'NYC'], ['Bob', 2, 'Paris']]
+    info = []
+    assert Evaluator().check_columns(pred, gt, 'list the names', info) == (True, [['name'], ['Ann'], ['Bob']])
+    assert info == []
+
+def test_check_columns_rejects_mentioned_surplus(split_tokenize):
+    gt = [['name'], ['Ann']]
+    pred = [['name', 'city'], ['Ann', 'NYC']]
+    info = []
+    assert Evaluator().check_columns(pred, gt, 'list the name and city', info) == (False, None)
+    assert info == ["Surplus column 'city' in pred is mentioned in nl."]
+
+def test_check_columns_missing_and_unequal_columns(split_tokenize):
+    gt = [['a', 'b'], ['1', '2']]
+    info = []
+    assert Evaluator().check_columns([['a'], ['1']], gt, '', info) == (False, None)
+    pred = [['a', 'b', 'c'], ['1', '2', '3']]
+    assert Evaluator().check_columns(pred, gt, '', info) == (True, [['a', 'b'], ['1', '2']])
+
+def test_negated_sentence_mentions_nothing(split_tokenize):
+    gt = [['name'], ['Ann']]
+    pred = [['name', 'city'], ['Ann', 'NYC']]
+    assert Evaluator().check_columns(pred, gt, 'list the name. not the city', [])[0]
+    assert not Evaluator().check_columns(pred, gt, 'list the name. and the city', [])[0]
+
+def test_question_tokenized_once(split_tokenize, monkeypatch):
+    calls = []
+    monkeypatch.setattr(evaluator, 'word_tokenize', lambda text: calls.append(text) or text.split())
+    gt = [['name'], ['Ann']]
+    pred = [['name', 'id', 'zip'], ['Ann', 1, 2]]
+    for _ in range(5):
+        assert Evaluator().check_columns(pred, gt, 'list the name. of every person', [])[0]
+    assert sorted(calls) == [' of every person', 'id', 'list the name', 'zip']
+
+def test_quick_exec_match_permuted_tables():
+    gt = [['name', 'city'], ['Ann', 'NYC'], ['Bob', 'Paris']]
+    pred = [['town', 'who'], ['Paris', 'Bob'], ['NYC', 'Ann']]
+    assert Evaluator().quick_exec_match(pred, gt) == (True, pred, [['city', 'name'], ['NYC', 'Ann'], ['Paris', 'Bob']])
+
+def test_quick_exec_match_clear_mismatches():
+    gt = [['name', 'city'], ['Ann', 'NYC'], ['Bob', 'Paris']]
+    assert Evaluator().quick_exec_match([['name'], ['Ann'], ['Bob']], gt)[0] is False
+    assert Evaluator().quick_exec_match(gt + [['Cid', 'Rome']], gt)[0] is False
+    assert Evaluator().quick_exec_match([['name', 'city'], ['Ann', 'NYC'], ['Bob', 'Rome']], gt)[0] is False
+    # the same rows with the cells swapped between two columns of equal value sets, only the full comparison can tell
+    gt = [['a', 'b'], ['1', '2'], ['2', '1']]
+    assert Evaluator().quick_exec_match([['a', 'b'], ['2', '1'], ['1', '2']], gt)[0] is None
+
+def test_exec_match_skips_normalization_when_settled(monkeypatch):
+    def fail_normalize(tables):
+        raise AssertionError("settled by the quick check")
+    evaluator = Evaluator()
+    monkeypatch.setattr(evaluator, 'normalize_tables', fail_normalize)
+    gt = [['name', 'city'], ['Ann', 'NYC'], ['Bob', 'Paris']]
+    assert evaluator.eval_exec_match([['city', 'name'], ['Paris', 'Bob'], ['NYC', 'Ann']], gt, '')[0]
+    assert evaluator.eval_exec_match([['city', 'name'], ['Paris', 'Bob'], ['NYC', 'Ann']], gt, '',
+                                     need_diff=False) == (True, None, None, [])
+    mismatch = [['name', 'city'], ['Ann', 'NYC'], ['Bob', 'Rome']]
+    assert evaluator.eval_exec_match(mismatch, gt, '', need_diff=False)[:2] == (False, None)
+    with pytest.raises(AssertionError):
+        evaluator.eval_exec_match(mismatch, gt, '')
+
+def test_quick_match_reports_the_normalized_tables():
+    gt = [['name', 'city', 'zip'], ['Bob', 'Paris', '75'], ['Ann', 'NYC', '10'], ['Cid', 'Rome', '00']]
+    pred = [['zip', 'who', 'town'], ['00', 'Cid', 'Rome'], ['75', 'Bob', 'Paris'], ['10', 'Ann', 'NYC']]
+    tables = Evaluator().normalize_tables({'gt_res': gt, 'pred_res': pred})
+    assert Evaluator().eval_exec_match(pred, gt, '') == (True, tables['norm_pred'], tables['norm_gt'], [])
+
+########################### BENCHMARK ###############################
+def min_time(fn, repeat=5):
+    '''Best of `repeat` timings of `fn()`, with the garbage collector paused like `timeit` does.'''
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return min(timings)
+
+def time_visit(node1, node2, repeat=3):
+    evaluator = Evaluator()
+    return min_time(lambda: evaluator.visit(node1, node2), repeat)
+
+@pytest.mark.parametrize('n_cols', [200, 800])
+def test_benchmark_wide_select(n_cols):
+    gt = Select([col(i) for i in range(n_cols)])
+    pred = Select([col(i) for i in reversed(range(n_cols))])
+    print(f"Select with {n_cols} columns: {time_visit(gt, pred) * 1000:.2f} ms")
+
+def test_benchmark_linear_in_clause_size():
+    sizes = (200, 1600)
+    select_timings = [time_visit(Select([col(i) for i in range(n)]), Select([col(i) for i in reversed(range(n))]))
+                      for n in sizes]
+    where_timings = [time_visit(where_chain(n), where_chain(n)) for n in sizes]
+    print(f"Select timings: {dict(zip(sizes, select_timings))}, Where timings: {dict(zip(sizes, where_timings))}")
+    # 8x more items: linear ~8x, the old nested `in` scans were ~64x
+    assert select_timings[1] / select_timings[0] < 32
+    assert where_timings[1] / where_timings[0] < 32
+
+def wide_table(n_cols, n_rows=100):
+    return [[f"c{j}" for j in range(n_cols)]] + [[f"v{i}_{j}" for j in range(n_cols)] for i in range(n_rows)]
+
+def test_benchmark_column_alignment_near_linear():
+    sizes = (50, 400)
+    timings = []
+    for n_cols in sizes:
+        gt = wide_table(n_cols)
+        pred = [row[::-1] for row in gt]
+        tables = Evaluator().normalize_tables({'gt_res': gt, 'pred_res': pred})
+        assert tables['norm_pred'][1:] == tables['norm_gt'][1:]
+        timings.append(min_time(lambda: Evaluator().normalize_tables({'gt_res': gt, 'pred_res': pred})))
+    print(f"Column alignment timings: {dict(zip(sizes, timings))}")
+    # 8x more columns: near-linear ~8x, the old pairwise set comparison was ~64x
+    assert timings[1] / timings[0] < 32
+
+def test_benchmark_surplus_columns_near_linear(split_tokenize):
+    sizes = (25, 200)
+    timings = []
+    for n_cols in sizes:
+        gt = wide_table(n_cols)
+        pred = [row + [f"s{i}_{k}" for k in range(5)] for i, row in enumerate(gt)]
+        ok, norm_pred = Evaluator().check_columns(pred, gt, 'nothing to see', [])
+        assert ok and norm_pred == gt
+        timings.append(min_time(lambda: Evaluator().check_columns(pred, gt, 'nothing to see', [])))
+    print(f"Surplus column timings: {dict(zip(sizes, timings))}")
+    # 8x more columns: near-linear ~8x, the old pairwise np.array rebuilds were ~8^3x
+    assert timings[1] / timings[0] < 32
+
+def test_benchmark_quick_exec_match_near_linear():
+    sizes = (4000, 32000)
+    timings = []
+    for n_rows in sizes:
+        gt = wide_table(5, n_rows)
+        pred = [gt[0]] + gt[:0:-1]
+        assert Evaluator().eval_exec_match(pred, gt, '')[0]
+        timings.append(min_time(lambda: Evaluator().eval_exec_match(pred, gt, ''), repeat=3))
+    print(f"Quick exec match timings: {dict(zip(sizes, timings))}")
+    assert timings[1] / timings[0] < 32
@@ -0,0 +1,42 @@
+import pytest
+from evaluator import Evaluator
+from utils import exec_cache as exec_cache_module
+from utils.exec_cache import ExecResultCache
+
+GT = [['name', 'city'], ['Ann', 'NYC'], ['Bob', 'Paris']]
+PRED = [['town', 'who'], ['Paris', 'Bob'], ['NYC', 'Ann']]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'data' / 'exec_cache.sqlite')
+
+def test_cached_result_across_runs(cache_path):
+    with ExecResultCache(cache_path) as cache:
+        result = cache.match(PRED, GT, 'where do they live', Evaluator().eval_exec_match)
+    def fail_match(*args, **kwargs):
+        raise AssertionError("should be served from the cache")
+    with ExecResultCache(cache_path) as cache:
+        assert cache.match(PRED, GT, 'where do they live', fail_match) == result
+
+def test_options_are_passed_and_cached_apart(cache_path):
+    calls = []
+    def eval_exec_match(pred_table, gt_table, nl, **options):
+        calls.append(options)
+        return bool(options), pred_table, gt_table, []
+    with ExecResultCache(cache_path) as cache:
+        assert not cache.match(PRED, GT, '', eval_exec_match)[0]
+        assert cache.match(PRED, GT, '', eval_exec_match, compare_header=True)[0]
+        assert cache.match(PRED, GT, '', eval_exec_match, compare_header=True)[0]
+    assert calls == [{}, {'compare_header': True}]
+
+def test_key_depends_on_content_question_and_code(cache_path, monkeypatch):
+    with ExecResultCache(cache_path) as cache:
+        key = cache.key(PRED, GT, 'q')
+        assert cache.key([row[:] for row in PRED], [row[:] for row in GT], 'q') == key
+        assert cache.key(PRED, GT + [['Cid', 'Rome']], 'q') != key
+        assert cache.key([['town', 'who'], ['Paris', 1], ['NYC', 'Ann']], GT, 'q') != \
+            cache.key([['town', 'who'], ['Paris', '1'], ['NYC', 'Ann']], GT, 'q')
+        assert cache.key(PRED, GT, 'another question') != key
+        monkeypatch.setattr(exec_cache_module, 'EVALUATOR_SOURCES', ('evaluator.py', 'utils/constants.py'))
+        assert cache.key(PRED, GT, 'q') != key
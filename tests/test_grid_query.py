@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+from utils.grid_query import query_rows
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'testcase_id': [f"tc_{i:02d}" for i in range(30)],
+        'complexity': [i % 5 + 1 for i in range(30)],
+        'is_match': [i % 3 == 0 for i in range(30)],
+    })
+
+def test_slice_of_unsorted_rows(frame):
+    assert query_rows(frame, {'startRow': 20, 'endRow': 40}) == (list(range(20, 30)), 30)
+
+def test_sort_on_server(frame):
+    request = {'startRow': 0, 'endRow': 3, 'sortModel': [{'colId': 'complexity', 'sort': 'desc'},
+                                                         {'colId': 'testcase_id', 'sort': 'asc'}]}
+    assert query_rows(frame, request) == ([4, 9, 14], 30)
+
+def test_text_and_number_filters(frame):
+    request = {'startRow': 0, 'endRow': 20, 'filterModel': {
+        'is_match': {'filterType': 'text', 'type': 'equals', 'filter': 'True'},
+        'complexity': {'filterType': 'number', 'type': 'inRange', 'filter': 2, 'filterTo': 4},
+    }}
+    assert query_rows(frame, request) == ([3, 6, 12, 18, 21, 27], 6)
+
+def test_compound_filter(frame):
+    request = {'startRow': 0, 'endRow': 20, 'filterModel': {'testcase_id': {
+        'filterType': 'text', 'operator': 'OR',
+        'conditions': [{'type': 'endsWith', 'filter': '01'}, {'type': 'startsWith', 'filter': 'TC_2'}],
+    }}}
+    positions, row_count = query_rows(frame, request)
+    assert positions == [1] + list(range(20, 30)) and row_count == 11
@@ -1,8 +1,10 @@
 import pytest
+import time
 # from unittest.mock import MagicMock, patch
 from lexer import Lexer
 import sys
 from utils.schema import get_schema_from_json
+from utils.constants import TOKEN_CODES, ID_CODE, STRING_CODE, NUMBER_CODE
 
 # Mock KEYWORDS for testing
 # sys.modules['utils.constants'] = MagicMock()
@@ -42,25 +44,10 @@ def test_tokenize_with_schema_prefix(mock_schema):
     assert 'employees.firstname' in lexer.toks
     assert 'employees' in lexer.toks
 
-def test_scan_alias_as_keyword(mock_schema):
-    sql = "SELECT name AS n FROM city AS c"
-    lexer = Lexer(sql, mock_schema)
-    assert lexer._alias_tables['n'] == 'name'
-    assert lexer._alias_tables['c'] == 'city'
-
-def test_scan_alias_without_as(mock_schema):
+def test_alias_tokens_are_kept(mock_schema):
     sql = "SELECT name n FROM city c"
     lexer = Lexer(sql, mock_schema)
-    assert lexer._alias_tables['n'] == 'name'
-    assert lexer._alias_tables['c'] == 'city'
-
-def test_get_merged_alias_table(mock_schema):
-    sql = "SELECT country as ct from offices as o"
-    lexer = Lexer(sql, mock_schema)
-    merged = lexer.get_merged_alias_table(mock_schema)
-    assert merged['offices'] == 'offices'
-    assert merged['o'] == 'offices'
-    assert merged['ct'] == 'country'
+    assert lexer.toks == ['select', 'name', 'n', 'from', 'city', 'c']
 
 def test_unexpected_quote_raises(mock_schema):
     sql = "SELECT name FROM city WHERE name = 'New York"
@@ -95,4 +82,70 @@ def test_table_name_in_quotes(mock_schema):
 def test_col_name_in_quotes(mock_schema):
     sql = "SELECT 'car_retails'.offices.'officecode' from 'car_retails'.offices"
     lexer = Lexer(sql, mock_schema)
-    assert lexer.toks == ['select', 'offices.officecode', 'from', 'offices']
\ No newline at end of file
+    assert lexer.toks == ['select', 'offices.officecode', 'from', 'offices']
+
+def test_token_kinds(mock_schema):
+    sql = "SELECT name FROM city WHERE population >= 1.5 AND name = 'New York'"
+    lexer = Lexer(sql, mock_schema)
+    assert lexer.toks == ['select', 'name', 'from', 'city', 'where', 'population', '>=', '1.5', 'and', 'name', '=', '"New York"']
+    assert lexer.kinds == ['kw', 'id', 'kw', 'id', 'kw', 'id', 'op', 'number', 'kw', 'id', 'op', 'string']
+
+def test_negative_number(mock_schema):
+    sql = "SELECT a FROM t WHERE x = -1 AND y-1 > 2"
+    lexer = Lexer(sql, mock_schema)
+    assert lexer.toks == ['select', 'a', 'from', 't', 'where', 'x', '=', '-1', 'and', 'y', '-', '1', '>', '2']
+
+def test_in_list_and_operators_without_spaces(mock_schema):
+    sql = "SELECT t.* FROM t WHERE id IN (1,2,3) AND a=b"
+    lexer = Lexer(sql, mock_schema)
+    assert lexer.toks == ['select', 't.*', 'from', 't', 'where', 'id', 'in', '(', '1', ',', '2', ',', '3', ')', 'and', 'a', '=', 'b']
+
+def test_token_codes(mock_schema):
+    sql = "SELECT name FROM city WHERE id = 3 AND name = 'Hue'"
+    lexer = Lexer(sql, mock_schema)
+    assert list(lexer.codes) == [
+        TOKEN_CODES['select'], ID_CODE, TOKEN_CODES['from'], ID_CODE, TOKEN_CODES['where'], ID_CODE,
+        TOKEN_CODES['='], NUMBER_CODE, TOKEN_CODES['and'], ID_CODE, TOKEN_CODES['='], STRING_CODE]
+
+def test_quoted_alias_is_a_string_token(mock_schema):
+    sql = 'SELECT "p"."productvendor" FROM "car_retails"."products" "p"'
+    lexer = Lexer(sql, mock_schema)
+    assert lexer.toks == ['select', 'p.productvendor', 'from', 'products', '"p"']
+    assert lexer.codes[-1] == STRING_CODE
+
+def test_next_clause_skips_nested_blocks(mock_schema):
+    sql = "SELECT id FROM city WHERE id IN (SELECT id FROM country) ORDER BY id"
+    lexer = Lexer(sql, mock_schema)
+    toks, next_clause = lexer.toks, lexer.next_clause
+    where_idx = toks.index('where')
+    assert toks[next_clause[where_idx + 1]] == 'order'    # the subquery's clauses are skipped
+    inner_select = toks.index('select', 1)
+    assert toks[next_clause[inner_select + 1]] == 'from'
+    assert next_clause[toks.index(')') - 1] == len(toks)  # the block ends before any clause
+    assert len(next_clause) == len(toks)
+
+########################### BENCHMARK ###############################
+def in_list_sql(n_literals):
+    values = ", ".join(f"'city {i}'" for i in range(n_literals))
+    return f"SELECT name FROM city WHERE name IN ({values})"
+
+def time_tokenize(sql, schema, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Lexer(sql, schema)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+@pytest.mark.parametrize('n_literals', [10, 100, 1000])
+def test_benchmark_quoted_literals(mock_schema, n_literals):
+    lexer = Lexer(in_list_sql(n_literals), mock_schema)
+    assert lexer.toks[7:10] == ['(', '"city 0"', ',']
+    assert sum(kind == 'string' for kind in lexer.kinds) == n_literals
+    print(f"{n_literals} literals: {time_tokenize(in_list_sql(n_literals), mock_schema):.6f}s")
+
+def test_benchmark_linear_in_literals(mock_schema):
+    t_100 = time_tokenize(in_list_sql(100), mock_schema)
+    t_1000 = time_tokenize(in_list_sql(1000), mock_schema)
+    # 10x more literals: linear ~10x, quadratic ~100x
+    assert t_1000 / t_100 < 30
\ No newline at end of file
@@ -0,0 +1,74 @@
+import pytest
+from collections import Counter
+from lexer import Lexer
+from refactor.parser import Parser
+from refactor.nodes import *
+from utils.schema import Schema, get_schema_from_json
+from utils.constants import *
+
+
+@pytest.fixture
+def mock_schema():
+    schema_name, schema = get_schema_from_json('mocked_data/tables.json')
+    return Schema(schema, schema_name)
+
+def parse(sql, schema):
+    return Parser(Lexer(sql, schema), schema).parse()
+
+def test_nodes_have_no_instance_dict(mock_schema):
+    sql = "SELECT COUNT(e.firstname), e.officecode + e.reportsto FROM employees AS e WHERE e.officecode = '1' LIMIT 3"
+    result = parse(sql, mock_schema)
+    nodes = [result, result.select, result.from_, result.from_.table_unit, result.where, result.where.conds[0],
+             result.where.conds[0].val1, result.limit, *result.select.col_units]
+    for node in nodes:
+        assert not hasattr(node, '__dict__'), type(node).__name__
+
+def test_equal_nodes_hash_equal(mock_schema):
+    sql = "SELECT DISTINCT e.firstname, COUNT(*) FROM employees AS e WHERE e.officecode = '1' AND e.reportsto > 3"
+    gt = parse(sql, mock_schema)
+    pred = parse(sql.replace(' AS e', ' AS emp').replace('e.', 'emp.'), mock_schema)
+    for node1, node2 in zip(gt.select.col_units + gt.where.conds + [gt.from_.table_unit, gt.limit],
+                            pred.select.col_units + pred.where.conds + [pred.from_.table_unit, pred.limit]):
+        assert node1 == node2
+        assert hash(node1) == hash(node2)
+
+def test_nodes_as_multiset_keys():
+    name = ColRef('__employees.firstname__', 'employees.firstname')
+    count_all = Agg(AGG_OPS.index('count'), ColRef('__all__', '*'))
+    pred = Counter([name, count_all, ColRef('__employees.firstname__', 'employees.firstname')])
+    gt = Counter([count_all, ColRef('__employees.firstname__', 'firstname')])
+    assert sum((pred & gt).values()) == 2
+    assert {ValueUnit('string', '"1"'), ValueUnit('string', '"1"'), ValueUnit('number', 1.0)} == {
+        ValueUnit('number', 1.0), ValueUnit('string', '"1"')}
+
+def test_flipped_cond_is_equal():
+    a, b = ColRef('__t.a__', 't.a'), ColRef('__t.b__', 't.b')
+    lt, gt = WHERE_OPS.index('<'), WHERE_OPS.index('>')
+    cond, flipped = Cond(False, lt, a, ValueUnit('col', b), None), Cond(False, gt, b, ValueUnit('col', a), None)
+    assert (cond.col_unit, cond.op_id) == (flipped.col_unit, flipped.op_id) == (a, lt)
+    assert cond == flipped
+    assert hash(cond) == hash(flipped)
+
+def test_value_first_cond_is_flipped():
+    a, five = ColRef('__t.a__', 't.a'), ValueUnit('number', 5.0)
+    cond = Cond(False, WHERE_OPS.index('<'), five, ValueUnit('col', a), None)
+    assert cond == Cond(False, WHERE_OPS.index('>'), a, five, None)
+
+@pytest.mark.parametrize('op, negated', [('>=', '<'), ('<', '>='), ('>', '<='), ('<=', '>'), ('=', '!='), ('!=', '=')])
+def test_not_is_pushed_into_op(op, negated):
+    a, five = ColRef('__t.a__', 't.a'), ValueUnit('number', 5.0)
+    cond = Cond(True, WHERE_OPS.index(op), a, five, None)
+    assert not cond.not_op
+    assert cond == Cond(False, WHERE_OPS.index(negated), a, five, None)
+
+def test_not_kept_for_ops_without_negation():
+    a, value = ColRef('__t.a__', 't.a'), ValueUnit('string', '"x%"')
+    cond = Cond(True, WHERE_OPS.index('like'), a, value, None)
+    assert cond.not_op
+    assert cond != Cond(False, WHERE_OPS.index('like'), a, value, None)
+
+def test_parsed_equivalent_conditions_match(mock_schema):
+    gt = parse("SELECT firstname FROM employees WHERE employeenumber < reportsto AND officecode = reportsto", mock_schema)
+    pred = parse("SELECT firstname FROM employees WHERE reportsto > employeenumber AND reportsto = officecode", mock_schema)
+    assert gt.where.conds == pred.where.conds
+    assert set(gt.where.conds) == set(pred.where.conds)
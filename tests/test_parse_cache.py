@@ -0,0 +1,64 @@
+import time
+import pytest
+from lexer import Lexer
+from refactor.parser import Parser
+from utils import parse_cache as parse_cache_module
+from utils.parse_cache import CachedParseError, ParseCache
+from utils.schema import SchemaRegistry
+
+SQL = "select t.customername from customers as t where t.creditlimit > (select avg(creditlimit) from customers)"
+
+
+@pytest.fixture
+def schema():
+    return SchemaRegistry('mocked_data/tables.json')['car_retails']
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'data' / 'parse_cache.sqlite')
+
+def parse(sql, schema):
+    return Parser(lexer=Lexer(sql, schema=schema), schema=schema).parse()
+
+def test_cached_ast_across_runs(cache_path, schema):
+    with ParseCache(cache_path) as cache:
+        ast = cache.parse(SQL, schema, lambda: parse(SQL, schema))
+    def fail_parse():
+        raise AssertionError("should be served from the cache")
+    with ParseCache(cache_path) as cache:
+        assert str(cache.parse(SQL, schema, fail_parse)) == str(ast)
+        assert cache.get("select * from customers", schema) is None
+
+def test_key_depends_on_schema_and_parser_code(cache_path, schema, monkeypatch):
+    with ParseCache(cache_path) as cache:
+        key = cache.key(SQL, schema)
+        assert cache.key(f"  {SQL}\n", schema) == key
+        other_schema = SchemaRegistry('mocked_data/tables.json')['car_retails']
+        other_schema.schema_dict['customers'].append('nickname')
+        other_schema._fingerprint = None
+        assert cache.key(SQL, other_schema) != key
+        monkeypatch.setattr(parse_cache_module, 'PARSER_SOURCES', ('lexer.py',))
+        assert cache.key(SQL, schema) != key
+
+def test_parse_errors_are_cached(cache_path, schema):
+    def fail_parse():
+        raise KeyError('unknown')
+    with ParseCache(cache_path) as cache:
+        with pytest.raises(KeyError):
+            cache.parse(SQL, schema, fail_parse)
+    with ParseCache(cache_path) as cache:
+        with pytest.raises(CachedParseError, match="KeyError: 'unknown'"):
+            cache.parse(SQL, schema, lambda: parse(SQL, schema))
+
+def test_least_recently_used_are_evicted(cache_path, schema):
+    queries = [f"select customername from customers where creditlimit > {i}" for i in range(3)]
+    with ParseCache(cache_path, max_entries=2) as cache:
+        for sql in queries[:2]:
+            cache.put(sql, schema, parse(sql, schema))
+        time.sleep(0.01)
+        assert cache.get(queries[0], schema) is not None
+        cache.put(queries[2], schema, parse(queries[2], schema))
+        cache.flush()
+        assert len(cache) == 2
+        assert cache.get(queries[1], schema) is None
+        assert cache.get(queries[0], schema) is not None
@@ -108,6 +108,51 @@ def test_alias(mock_schema):
     assert result.select.col_units[0].col_name == 'employees.firstname'
     assert result.select.col_units[0].col_id == '__employees.firstname__'
 
+def test_alias_without_as(mock_schema):
+    sql = "SELECT e.firstname FROM employees e JOIN offices o ON e.officecode = o.officecode"
+    result = Parser(Lexer(sql, mock_schema), mock_schema).parse()
+    assert result.select.col_units[0].col_name == 'employees.firstname'
+    assert result.from_.joins[0].on_condition[0].val1.value.col_name == 'offices.officecode'
+
+def test_quoted_alias(mock_schema):
+    sql = 'SELECT "p"."productvendor" FROM "car_retails"."products" "p"'
+    result = Parser(Lexer(sql, mock_schema), mock_schema).parse()
+    assert result.select.col_units[0].col_name == 'products.productvendor'
+
+def test_column_alias_in_order_by(mock_schema):
+    sql = "SELECT country, COUNT(*) AS n FROM customers GROUP BY country ORDER BY n DESC"
+    result = Parser(Lexer(sql, mock_schema), mock_schema).parse()
+    col_unit, order = result.order_by.order_cols[0]
+    assert col_unit is result.select.col_units[1]
+    assert order == 'desc'
+
+def test_having_is_not_an_alias(mock_schema):
+    sql = "SELECT country FROM customers GROUP BY country HAVING COUNT(*) > 5"
+    result = Parser(Lexer(sql, mock_schema), mock_schema).parse()
+    assert len(result.having.conds) == 1
+
+def test_correlated_subquery_alias(mock_schema):
+    sql = ("SELECT e.firstname FROM employees AS e WHERE e.officecode IN "
+           "(SELECT o.officecode FROM offices AS o WHERE o.officecode = e.officecode)")
+    result = Parser(Lexer(sql, mock_schema), mock_schema).parse()
+    subquery = result.where.conds[0].val1.value
+    assert isinstance(subquery, Sql)
+    inner_cond = subquery.where.conds[0]
+    # e.officecode is resolved in the outer scope
+    assert {inner_cond.col_unit.col_name, inner_cond.val1.value.col_name} == {'offices.officecode', 'employees.officecode'}
+
+def test_subquery_alias_shadows_outer_alias(mock_schema):
+    sql = ("SELECT t.firstname FROM employees AS t WHERE t.officecode IN "
+           "(SELECT t.officecode FROM offices AS t)")
+    result = Parser(Lexer(sql, mock_schema), mock_schema).parse()
+    assert result.select.col_units[0].col_name == 'employees.firstname'
+    assert result.where.conds[0].val1.value.select.col_units[0].col_name == 'offices.officecode'
+
+def test_subquery_alias_not_visible_outside(mock_schema):
+    sql = "SELECT o.city FROM employees WHERE officecode IN (SELECT o.officecode FROM offices AS o)"
+    with pytest.raises(KeyError):
+        Parser(Lexer(sql, mock_schema), mock_schema).parse()
+
 ############################ TEST DATASET ###########################
 def test_dataset_1(mock_schema):
     sql = "SELECT DISTINCT T1.productVendor, T1.MSRP - T1.buyPrice FROM products AS T1 INNER JOIN orderdetails AS T2 ON T1.productCode = T2.productCode GROUP BY T1.productVendor, T1.MSRP, T1.buyPrice ORDER BY SUM(T2.quantityOrdered) DESC LIMIT 1"
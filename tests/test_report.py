@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from utils.report import export_report, write_summary
+from utils.sink import JsonlSink
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMNS = {'testcase_id': 'Testcase ID', 'pred_sql': 'Predicted SQL', 'table_html': 'Table'}
+
+
+@pytest.fixture
+def sink(tmp_path):
+    with JsonlSink(str(tmp_path / 'data' / 'content_matching.jsonl')) as sink:
+        for i in range(3):
+            sink.write({'testcase_id': f"tc_{i}", 'pred_sql': f"SELECT a FROM t WHERE a < {i}",
+                        'is_match': np.bool_(i % 2 == 0)})
+    return sink
+
+def render(record):
+    return {**record, 'table_html': f"<table><tr><td>{record['testcase_id']}</td></tr></table>"}
+
+def test_export_report(tmp_path, sink):
+    summary = {'total': 3, 'total_match': np.int64(2), 'scores': {'all': {'count': 3}}}
+    paths = export_report(str(tmp_path / 'report'), 'content_matching', "Content <Report>", summary, sink,
+                          render, COLUMNS, html_fields=('table_html',))
+    with open(paths['data'], encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['summary'] == {'total': 3, 'total_match': 2, 'scores': {'all': {'count': 3}}}
+    assert [record['testcase_id'] for record in data['records']] == ['tc_0', 'tc_1', 'tc_2']
+    assert data['records'][1]['is_match'] is False
+    with open(paths['html'], encoding='utf-8') as f:
+        page = f.read()
+    assert "<title>Content &lt;Report&gt;</title>" in page
+    assert "WHERE a &lt; 2" in page and "<table><tr><td>tc_2</td></tr></table>" in page
+    assert "<b>total_match:</b> 2" in page and "scores" not in page
+
+def test_write_summary(tmp_path):
+    path = str(tmp_path / 'report' / 'summary.json')
+    write_summary(path, {'match_rate': np.float64(0.5)})
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'match_rate': 0.5}
+
+HEADLESS_RUN = """
+import json, sys
+import benchmark, evaluator
+from utils import Visualizer
+evaluator.word_tokenize = str.split     # the nltk punkt data may be missing
+benchmark.Visualizer = lambda: Visualizer(root_dir='results')
+summary = benchmark.evaluate(*sys.argv[1:4], {}, *[sys.argv[4]] * 3, headless=True, report_dir='report')
+print(json.dumps({'pandas': 'pandas' in sys.modules, 'dash': 'dash' in sys.modules, 'total': summary['total']}))
+"""
+
+def test_headless_evaluate_without_viewer_dependencies(tmp_path):
+    args = [os.path.join(REPO_DIR, 'aqua_benchmark_dataset.yml'), os.path.join(REPO_DIR, 'mocked_data', 'tables.json'),
+            'exec', os.path.join(REPO_DIR, 'tmp', 'tests', 'aqua_benchmark')]
+    run = subprocess.run([sys.executable, '-c', HEADLESS_RUN, *args], cwd=tmp_path, capture_output=True, text=True,
+                         env={**os.environ, 'PYTHONPATH': REPO_DIR})
+    assert run.returncode == 0, run.stderr
+    loaded = json.loads(run.stdout.strip().splitlines()[-1])
+    assert loaded == {'pandas': False, 'dash': False, 'total': loaded['total']} and loaded['total'] > 0
+    assert sorted(os.listdir(tmp_path / 'report')) == ['exec_matching.html', 'exec_matching.json', 'summary.json']
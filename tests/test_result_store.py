@@ -0,0 +1,170 @@
+import gc
+import io
+import json
+import os
+import time
+import pytest
+from utils import result_store
+from utils.exec_cache import content_hash
+from utils.result_store import ResultTableStore, CachedTable, PRED_TABLE_FILE, GT_TABLE_FILE, CACHE_SUFFIX
+from utils.sink import JsonlSink
+
+
+def make_run_dir(root, n_runs, table_file=PRED_TABLE_FILE, n_rows=20):
+    for i in range(n_runs):
+        table_path = os.path.join(root, f"run_{i:05d}", table_file)
+        os.makedirs(os.path.dirname(table_path), exist_ok=True)
+        with open(table_path, 'w', encoding='utf-8') as f:
+            json.dump([['id', 'name']] + [[str(j), f"name_{i}_{j}"] for j in range(n_rows)], f)
+    return root
+
+@pytest.fixture
+def count_loads(monkeypatch):
+    counter = {'loads': 0}
+    json_load = json.load
+    def counting_load(f):
+        counter['loads'] += 1
+        return json_load(f)
+    monkeypatch.setattr(result_store.json, 'load', counting_load)
+    return counter
+
+def test_index_sorted_run_ids(tmp_path):
+    make_run_dir(str(tmp_path), 3)
+    (tmp_path / 'not_a_run.txt').write_text('')
+    store = ResultTableStore(str(tmp_path), PRED_TABLE_FILE)
+    assert store.run_ids == ['run_00000', 'run_00001', 'run_00002']
+    assert len(store) == 3
+
+def test_get_by_run_id_and_position(tmp_path):
+    make_run_dir(str(tmp_path), 3)
+    store = ResultTableStore(str(tmp_path), PRED_TABLE_FILE)
+    assert store.get('run_00001') == store[1]
+    assert store[1][1] == ['0', 'name_1_0']
+
+def test_missing_table_is_none(tmp_path):
+    make_run_dir(str(tmp_path), 2)
+    os.makedirs(tmp_path / 'run_00002')
+    store = ResultTableStore(str(tmp_path), PRED_TABLE_FILE)
+    assert store[2] is None
+
+def test_missing_root_dir_is_empty(tmp_path):
+    store = ResultTableStore(str(tmp_path / 'missing'), GT_TABLE_FILE)
+    assert len(store) == 0
+
+def test_each_table_loaded_once(tmp_path, count_loads):
+    make_run_dir(str(tmp_path), 10)
+    store = ResultTableStore(str(tmp_path), PRED_TABLE_FILE)
+    assert count_loads['loads'] == 0    # lazy
+    for _ in range(3):
+        for idx in range(len(store)):
+            store[idx]
+    assert count_loads['loads'] == 10
+
+def test_no_cache_keeps_no_tables(tmp_path, count_loads):
+    make_run_dir(str(tmp_path), 3)
+    store = ResultTableStore(str(tmp_path), PRED_TABLE_FILE, cache=False)
+    assert store[0] == store[0]
+    assert count_loads['loads'] == 2
+    assert store._tables == {}
+
+def test_null_table_is_none(tmp_path):
+    make_run_dir(str(tmp_path), 1)
+    (tmp_path / 'run_00000' / PRED_TABLE_FILE).write_text('null')
+    assert ResultTableStore(str(tmp_path), PRED_TABLE_FILE)[0] is None
+
+def test_binary_cache_round_trip(tmp_path, count_loads):
+    make_run_dir(str(tmp_path), 2)
+    tables = list(ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True))
+    assert os.path.isdir(tmp_path / 'run_00000' / (PRED_TABLE_FILE + CACHE_SUFFIX))
+    cached = list(ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True))
+    assert cached == tables
+    assert all(type(cell) is str for table in cached for row in table for cell in row)
+    assert count_loads['loads'] == 2 + 2    # the 2 JSON tables once, then only the 2 cache meta files
+
+def test_binary_cache_is_refreshed_when_json_changes(tmp_path):
+    make_run_dir(str(tmp_path), 1)
+    ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0]
+    table_path = tmp_path / 'run_00000' / PRED_TABLE_FILE
+    table_path.write_text(json.dumps([['id'], ['changed']]))
+    os.utime(table_path, ns=(0, 0))
+    assert ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0] == [['id'], ['changed']]
+
+def test_binary_cache_skips_non_string_tables(tmp_path):
+    make_run_dir(str(tmp_path), 1)
+    table_path = tmp_path / 'run_00000' / PRED_TABLE_FILE
+    table_path.write_text(json.dumps([['id', 'score'], ['1', 2.5], ['2', None]]))
+    assert ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0] == [['id', 'score'], ['1', 2.5], ['2', None]]
+    assert not os.path.exists(str(table_path) + CACHE_SUFFIX)
+
+def test_binary_cache_rows_are_lazy(tmp_path):
+    make_run_dir(str(tmp_path), 1, n_rows=10000)
+    table = ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0]
+    cached = ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0]
+    assert isinstance(cached, CachedTable) and len(cached) == len(table) == 10001
+    assert cached[0] == ['id', 'name'] and cached[-1] == table[-1] and cached[5000] == table[5000]
+    assert cached[1:4] == table[1:4] and cached[:2] == table[:2] and cached[::2500] == table[::2500]
+    assert list(cached) == table and cached == table
+
+def test_binary_cache_is_not_padded(tmp_path):
+    make_run_dir(str(tmp_path), 1)
+    table_path = tmp_path / 'run_00000' / PRED_TABLE_FILE
+    table = [['id', 'text']] + [[str(i), 'é' * 10000 if i == 0 else 'x'] for i in range(1000)]
+    table_path.write_text(json.dumps(table), encoding='utf-8')
+    ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0]
+    cache_size = sum(f.stat().st_size for f in (tmp_path / 'run_00000' / (PRED_TABLE_FILE + CACHE_SUFFIX)).iterdir())
+    # fixed-width unicode would take 1000 cells x 10000 chars x 4 bytes
+    assert cache_size < 100000
+    assert ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0] == table
+
+def test_binary_cache_keeps_gc_state(tmp_path):
+    make_run_dir(str(tmp_path), 1)
+    ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0]
+    gc.disable()
+    try:
+        list(ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0])
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+def test_cached_table_serializes_like_its_rows(tmp_path):
+    make_run_dir(str(tmp_path), 1)
+    table = ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0]
+    cached = ResultTableStore(str(tmp_path), PRED_TABLE_FILE, binary_cache=True)[0]
+    assert content_hash(cached) == content_hash(table)
+    with JsonlSink(str(tmp_path / 'sink.jsonl')) as sink:
+        sink.write({'pred_res': cached})
+    assert sink.read(0) == {'pred_res': table}
+
+class FakeIjson:
+    """Stand-in for ijson (not a dependency): yields the items of the top-level array of a binary file."""
+    @staticmethod
+    def items(f, prefix, use_float=False):
+        assert prefix == 'item' and use_float and isinstance(f, io.BufferedReader)
+        yield from json.load(f)
+
+def test_load_table_with_ijson(tmp_path, monkeypatch):
+    make_run_dir(str(tmp_path), 2)
+    monkeypatch.setattr(result_store, 'ijson', FakeIjson)
+    (tmp_path / 'run_00001' / PRED_TABLE_FILE).write_text('null')
+    store = ResultTableStore(str(tmp_path), PRED_TABLE_FILE)
+    assert store[0][:2] == [['id', 'name'], ['0', 'name_0_0']] and len(store[0]) == 21
+    assert store[1] is None
+
+########################### BENCHMARK ###############################
+def run_suite(root):
+    '''Mimic the access pattern of `benchmark.evaluate`: one table lookup per testcase.'''
+    start = time.perf_counter()
+    store = ResultTableStore(root, PRED_TABLE_FILE)
+    for idx in range(len(store)):
+        store[idx]
+    return time.perf_counter() - start
+
+def test_benchmark_linear_in_suite_size(tmp_path):
+    sizes = (100, 400)
+    timings = []
+    for n in sizes:
+        root = make_run_dir(str(tmp_path / f"suite_{n}"), n)
+        timings.append(min(run_suite(root) for _ in range(3)))
+    print(f"Result table store timings: {dict(zip(sizes, timings))}")
+    # 4x more testcases: linear ~4x, the old per-testcase reload was ~16x
+    assert timings[1] / timings[0] < 10
@@ -0,0 +1,49 @@
+import json
+import pytest
+from utils import schema as schema_module
+from utils.schema import Schema, SchemaRegistry, get_schema_from_json
+
+
+@pytest.fixture
+def multi_db_tables(tmp_path):
+    with open('mocked_data/tables.json', 'r', encoding='utf-8') as f:
+        car_retails = json.load(f)[0]
+    shop = {
+        'db_id': 'Shop',
+        'table_names': ['item', 'store'],
+        'column_names_original': [[-1, '*'], [0, 'itemId'], [1, 'storeId'], [0, 'price'], [1, 'City']],
+    }
+    fpath = tmp_path / 'tables.json'
+    fpath.write_text(json.dumps([car_retails, shop]), encoding='utf-8')
+    return str(fpath)
+
+def test_registry_matches_get_schema_from_json():
+    schema_name, schema_dict = get_schema_from_json('mocked_data/tables.json')
+    schema = SchemaRegistry('mocked_data/tables.json')[schema_name]
+    assert schema.schema_dict == schema_dict
+    assert schema.idMap == Schema(schema_dict, schema_name).idMap
+
+def test_registry_serves_every_db_id(multi_db_tables):
+    registry = SchemaRegistry(multi_db_tables)
+    assert registry.db_ids == ['car_retails', 'shop']
+    assert 'employees' in registry['car_retails'].schema_dict
+    assert registry['shop'].schema_dict == {'item': ['itemid', 'price'], 'store': ['storeid', 'city']}
+    assert registry['shop'].idMap['store.city'] == '__store.city__'
+
+def test_registry_builds_schema_once(multi_db_tables):
+    registry = SchemaRegistry(multi_db_tables)
+    assert registry['SHOP'] is registry['shop']
+
+def test_registry_reads_file_once(multi_db_tables, monkeypatch):
+    registry = SchemaRegistry(multi_db_tables)
+    def fail_load(f):
+        raise AssertionError("tables.json should only be parsed once")
+    monkeypatch.setattr(schema_module.json, 'load', fail_load)
+    registry['car_retails']
+    registry['shop']
+
+def test_registry_unknown_db(multi_db_tables):
+    registry = SchemaRegistry(multi_db_tables)
+    assert 'unknown' not in registry
+    with pytest.raises(KeyError):
+        registry['unknown']
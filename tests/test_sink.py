@@ -0,0 +1,46 @@
+import json
+import numpy as np
+import pytest
+from utils.sink import JsonlSink
+
+
+@pytest.fixture
+def records():
+    return [{'testcase_id': f"tc_{i}", 'is_match': np.bool_(i % 2 == 0), 'score': np.float64(i / 10), 'info': []}
+            for i in range(25)]
+
+def test_write_is_visible_immediately(tmp_path, records):
+    sink = JsonlSink(str(tmp_path / 'out' / 'exec_matching.jsonl'))
+    sink.write(records[0])
+    assert sink.read(0) == {'testcase_id': 'tc_0', 'is_match': True, 'score': 0.0, 'info': []}
+    sink.close()
+
+def test_read_page(tmp_path, records):
+    with JsonlSink(str(tmp_path / 'exec_matching.jsonl')) as sink:
+        for record in records:
+            sink.write(record)
+    assert len(sink) == 25
+    page = sink.read_page(20, 10)
+    assert [r['testcase_id'] for r in page] == ['tc_20', 'tc_21', 'tc_22', 'tc_23', 'tc_24']
+    assert sink.read_page(30, 10) == []
+    assert [r['testcase_id'] for r in sink] == [f"tc_{i}" for i in range(25)]
+
+def test_from_file(tmp_path, records):
+    path = str(tmp_path / 'content_matching.jsonl')
+    with JsonlSink(path) as sink:
+        for record in records:
+            sink.write(dict(record, pred_sql="SELECT 'ü' FROM t"))
+    reopened = JsonlSink.from_file(path)
+    assert len(reopened) == 25
+    assert reopened.read(7)['testcase_id'] == 'tc_7'
+    assert reopened.read(7)['pred_sql'] == "SELECT 'ü' FROM t"
+    with pytest.raises(AssertionError):
+        reopened.write(records[0])
+
+def test_one_json_record_per_line(tmp_path, records):
+    path = tmp_path / 'exec_matching.jsonl'
+    with JsonlSink(str(path)) as sink:
+        for record in records[:3]:
+            sink.write(record)
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['testcase_id'] for line in lines] == ['tc_0', 'tc_1', 'tc_2']
@@ -0,0 +1,44 @@
+import pytest
+from lexer import Lexer
+from refactor.parser import Parser
+from evaluator import Evaluator
+from utils import trace
+from utils.schema import Schema, get_schema_from_json
+
+
+@pytest.fixture
+def mock_schema():
+    schema_name, schema = get_schema_from_json('mocked_data/tables.json')
+    return Schema(schema, schema_name)
+
+@pytest.fixture
+def events():
+    collected = []
+    trace.enable(collected.append)
+    yield collected
+    trace.disable()
+
+def parse(sql, schema):
+    return Parser(Lexer(sql, schema), schema).parse()
+
+def test_disabled_by_default(mock_schema, monkeypatch):
+    collected = []
+    monkeypatch.setattr(trace, '_handlers', [collected.append])
+    assert not trace.ENABLED
+    parse("SELECT firstname FROM employees WHERE officecode = 1", mock_schema)
+    assert collected == []
+
+def test_stage_timings(mock_schema, events):
+    sql = "SELECT firstname FROM employees WHERE officecode = 1"
+    gt, pred = parse(sql, mock_schema), parse(sql, mock_schema)
+    Evaluator().eval_partial_match(pred, gt)
+    done = [(e['stage'], e['func']) for e in events if e['event'] == 'done']
+    assert done == [('lex', 'Lexer.tokenize'), ('parse', 'Parser.parse')] * 2 + [('match', 'Evaluator.eval_partial_match')]
+    assert all(e['elapsed_ms'] >= 0 and e['error'] is None for e in events if e['event'] == 'done')
+    assert {'col_ref', 'condition', 'where'} <= {e['event'] for e in events}
+
+def test_stage_error_is_recorded(mock_schema, events):
+    with pytest.raises(Exception):
+        parse("SELECT firstname FROM unknown_table", mock_schema)
+    assert events[-1]['stage'] == 'parse'
+    assert events[-1]['error'] is not None
@@ -1,12 +1,21 @@
 from .hardness_evaluator import HardnessEvaluator
 from .rebuilder import Rebuilder
 from .visualizer import Visualizer
-from .schema import Schema, get_schema
+from .schema import Schema, SchemaRegistry, get_schema
+from .result_store import ResultTableStore
+from .sink import JsonlSink
+from .parse_cache import ParseCache
+from .exec_cache import ExecResultCache
 
 __all__ = [
     'HardnessEvaluator',
     'Rebuilder',
     'Visualizer',
     'get_schema',
-    'Schema'
+    'Schema',
+    'SchemaRegistry',
+    'ResultTableStore',
+    'JsonlSink',
+    'ParseCache',
+    'ExecResultCache'
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
-CLAUSE_KEYWORDS = ('select', 'from', 'where', 'group', 'order', 'limit', 'intersect', 'union', 'except')
-JOIN_KEYWORDS = ('join', 'on', 'as', 'left', 'right', 'natural', 'inner', 'outer')
+CLAUSE_KEYWORDS = frozenset(('select', 'from', 'where', 'group', 'having', 'order', 'limit', 'intersect', 'union', 'except'))
+JOIN_KEYWORDS = frozenset(('join', 'on', 'as', 'left', 'right', 'natural', 'inner', 'outer'))
 
 WHERE_OPS = ('not', 'between', '=', '>', '<', '>=', '<=', '!=', 'in', 'like', 'is', 'exists')
 UNIT_OPS = ('none', '-', '+', "*", '/')
@@ -13,4 +13,24 @@ COND_OPS = ('and', 'or')
 SQL_OPS = ('intersect', 'union', 'except')
 ORDER_OPS = ('desc', 'asc')
 
-KEYWORDS = CLAUSE_KEYWORDS + JOIN_KEYWORDS + WHERE_OPS + UNIT_OPS + AGG_OPS + COND_OPS + SQL_OPS + ORDER_OPS + ('by', 'distinct')
\ No newline at end of file
+KEYWORDS = CLAUSE_KEYWORDS.union(JOIN_KEYWORDS, WHERE_OPS, UNIT_OPS, AGG_OPS, COND_OPS, SQL_OPS, ORDER_OPS, ('by', 'distinct'))
+PUNCTUATION = ('(', ')', ',', ';', '!', '%', '||')
+
+# interned token codes, the lexer emits one code per token in a parallel array('B')
+# keywords and punctuation get their own code, other tokens share the code of their kind
+ID_CODE, STRING_CODE, NUMBER_CODE, END_CODE = 0, 1, 2, 3   # END_CODE: past the last token
+TOKEN_CODES = {tok: code for code, tok in enumerate(sorted(KEYWORDS.union(PUNCTUATION)), start=END_CODE + 1)}
+
+def token_codes(*toks):
+    """Frozenset of the codes of the given keywords/punctuation, for O(1) dispatch in the parser."""
+    return frozenset(TOKEN_CODES[tok] for tok in toks)
+
+CLAUSE_CODES = token_codes(*CLAUSE_KEYWORDS)
+JOIN_CODES = token_codes(*JOIN_KEYWORDS)
+JOIN_START_CODES = token_codes('join', 'inner', 'outer', 'natural', 'left', 'right', ',')
+WHERE_OP_CODES = token_codes(*WHERE_OPS)
+UNIT_OP_CODES = token_codes(*UNIT_OPS)
+AGG_CODES = token_codes(*AGG_OPS)
+COND_CODES = token_codes(*COND_OPS)
+SQL_OP_CODES = token_codes(*SQL_OPS)
+ORDER_CODES = token_codes(*ORDER_OPS)
\ No newline at end of file
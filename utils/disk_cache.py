@@ -0,0 +1,87 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@lru_cache(maxsize=None)
+def code_fingerprint(sources: Tuple[str, ...]) -> str:
+    '''Hash of source files of this repo, cached values computed by that code are invalidated when it is edited.'''
+    digest = hashlib.sha256()
+    for source in sources:
+        with open(os.path.join(_ROOT_DIR, source), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def hash_key(*parts: str) -> str:
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent key -> value cache in a SQLite file, shared by evaluation runs and worker processes.
+    Values are pickled, None is not a valid value as it stands for a miss.
+    Past `max_entries`, the least recently used entries are evicted.
+    """
+    FLUSH_EVERY = 256
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._path = path
+        self._max_entries = max_entries
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, used REAL NOT NULL)')
+        self._hits: List[Tuple[float, str]] = []     # last use of the hit entries, written in batches
+        self._puts = 0
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def load(self, key: str) -> Optional[Any]:
+        row = self._conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self._hits.append((time.time(), key))
+        if len(self._hits) >= self.FLUSH_EVERY:
+            self.flush()
+        return pickle.loads(row[0])
+
+    def store(self, key: str, value: Any):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (key, blob, time.time()))
+        self._puts += 1
+        if self._puts % self.FLUSH_EVERY == 0:
+            self.flush()
+
+    def flush(self):
+        """Record the last use of the hit entries and evict the least recently used ones."""
+        with self._conn:
+            self._conn.executemany('UPDATE entries SET used = ? WHERE key = ?', self._hits)
+            self._conn.execute(
+                'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                (self._max_entries,))
+        self._hits = []
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def close(self):
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,36 @@
+import json
+from typing import Any, Callable, List, Tuple
+
+from utils.disk_cache import DiskCache, code_fingerprint, hash_key
+from utils.result_store import CachedTable
+
+# the execution match depends on this code, editing it invalidates the cached results
+EVALUATOR_SOURCES = ('evaluator.py',)
+
+
+def _encode(value: Any) -> Any:
+    # a lazy table hashes like the same list of rows
+    return list(value) if isinstance(value, CachedTable) else repr(value)
+
+def content_hash(value: Any) -> str:
+    return hash_key(json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=_encode))
+
+
+class ExecResultCache(DiskCache):
+    """
+    On-disk cache of `Evaluator.eval_exec_match` results: (score, norm_pred, norm_gt, info).
+    Entries are keyed by the content of both tables, the question, the match options and the
+    evaluator code, so re-running the same predictions skips normalizing and comparing their tables.
+    """
+    def key(self, pred_table: List[List[Any]], gt_table: List[List[Any]], nl: str, **options) -> str:
+        return hash_key(code_fingerprint(EVALUATOR_SOURCES), content_hash(pred_table), content_hash(gt_table),
+                        nl, json.dumps(options, sort_keys=True))
+
+    def match(self, pred_table, gt_table, nl: str, eval_exec_match: Callable[..., Tuple], **options) -> Tuple:
+        """Return the cached result of `eval_exec_match(pred_table, gt_table, nl, **options)`, computing it on a miss."""
+        key = self.key(pred_table, gt_table, nl, **options)
+        result = self.load(key)
+        if result is None:
+            result = eval_exec_match(pred_table, gt_table, nl, **options)
+            self.store(key, result)
+        return result
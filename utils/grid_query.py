@@ -0,0 +1,87 @@
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+
+def _text_mask(values: pd.Series, model: Dict[str, Any]) -> pd.Series:
+    text = values.astype(str).str.lower()
+    pattern = str(model.get('filter') or '').lower()
+    kind = model.get('type', 'contains')
+    if kind == 'contains':
+        return text.str.contains(pattern, regex=False)
+    if kind == 'notContains':
+        return ~text.str.contains(pattern, regex=False)
+    if kind == 'equals':
+        return text == pattern
+    if kind == 'notEqual':
+        return text != pattern
+    if kind == 'startsWith':
+        return text.str.startswith(pattern)
+    if kind == 'endsWith':
+        return text.str.endswith(pattern)
+    if kind == 'blank':
+        return values.isna() | (text == '')
+    if kind == 'notBlank':
+        return values.notna() & (text != '')
+    raise ValueError(f"Unknown text filter type: {kind}")
+
+def _number_mask(values: pd.Series, model: Dict[str, Any]) -> pd.Series:
+    numbers = pd.to_numeric(values, errors='coerce')
+    kind = model.get('type', 'equals')
+    if kind == 'blank':
+        return numbers.isna()
+    if kind == 'notBlank':
+        return numbers.notna()
+    bound = model.get('filter')
+    if kind == 'equals':
+        return numbers == bound
+    if kind == 'notEqual':
+        return numbers != bound
+    if kind == 'lessThan':
+        return numbers < bound
+    if kind == 'lessThanOrEqual':
+        return numbers <= bound
+    if kind == 'greaterThan':
+        return numbers > bound
+    if kind == 'greaterThanOrEqual':
+        return numbers >= bound
+    if kind == 'inRange':
+        return (numbers >= bound) & (numbers <= model.get('filterTo'))
+    raise ValueError(f"Unknown number filter type: {kind}")
+
+def _filter_mask(values: pd.Series, model: Dict[str, Any]) -> pd.Series:
+    '''Mask of one column filter of AG Grid, a single condition or conditions joined by AND / OR.'''
+    conditions = model.get('conditions')
+    if conditions is None and 'condition1' in model:     # older AG Grid versions
+        conditions = [model['condition1'], model['condition2']]
+    if conditions is not None:
+        masks = [_filter_mask(values, {'filterType': model.get('filterType'), **condition}) for condition in conditions]
+        combined = masks[0]
+        for mask in masks[1:]:
+            combined = (combined | mask) if model.get('operator') == 'OR' else (combined & mask)
+        return combined
+    if model.get('filterType') == 'number':
+        return _number_mask(values, model)
+    return _text_mask(values, model)
+
+def filter_frame(frame: pd.DataFrame, filter_model: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    mask = pd.Series(True, index=frame.index)
+    for col, model in filter_model.items():
+        mask &= _filter_mask(frame[col], model)
+    return frame[mask]
+
+def sort_frame(frame: pd.DataFrame, sort_model: List[Dict[str, str]]) -> pd.DataFrame:
+    if not sort_model:
+        return frame
+    return frame.sort_values(by=[sort['colId'] for sort in sort_model],
+                             ascending=[sort['sort'] == 'asc' for sort in sort_model], kind='stable')
+
+def query_rows(frame: pd.DataFrame, request: Dict[str, Any]) -> Tuple[List[Any], int]:
+    """
+    Serve a `getRowsRequest` of an AG Grid infinite row model from `frame`, filtered and sorted on the server.
+    Return the index labels of the rows in [startRow, endRow) and the number of rows left by the filters.
+    """
+    view = sort_frame(filter_frame(frame, request.get('filterModel') or {}), request.get('sortModel') or [])
+    start = request.get('startRow') or 0
+    end = request.get('endRow')
+    return view.index[start:end].tolist(), len(view)
@@ -0,0 +1,43 @@
+from typing import Any, Callable, Optional
+
+from utils.disk_cache import DiskCache, code_fingerprint, hash_key
+
+# the parse output depends on this code, editing it invalidates the cached ASTs
+PARSER_SOURCES = ('lexer.py', 'refactor/parser.py', 'refactor/nodes.py', 'utils/constants.py')
+
+
+class CachedParseError(Exception):
+    '''A parse error served from the cache, the SQL failed to parse in an earlier run.'''
+
+
+class ParseCache(DiskCache):
+    """
+    On-disk cache of parsed `Sql` ASTs.
+    Entries are keyed by the SQL string, the schema fingerprint and the lexer/parser code, so a run
+    after editing only the scoring code skips parsing, while editing the parser invalidates the cache.
+    Parse errors are cached too, and raised again as `CachedParseError`.
+    """
+    def key(self, sql: str, schema) -> str:
+        return hash_key(code_fingerprint(PARSER_SOURCES), schema.fingerprint, sql.strip())
+
+    def get(self, sql: str, schema) -> Optional[Any]:
+        """Return the cached AST of `sql`, None if it is not cached, or raise the cached `CachedParseError`."""
+        ast = self.load(self.key(sql, schema))
+        if isinstance(ast, CachedParseError):
+            raise ast
+        return ast
+
+    def put(self, sql: str, schema, ast: Any):
+        self.store(self.key(sql, schema), ast)
+
+    def parse(self, sql: str, schema, parse: Callable[[], Any]) -> Any:
+        """Return the cached AST of `sql`, or parse it with `parse()` and cache the AST or the error."""
+        ast = self.get(sql, schema)
+        if ast is None:
+            try:
+                ast = parse()
+            except Exception as e:
+                self.put(sql, schema, CachedParseError(f"{type(e).__name__}: {e}"))
+                raise
+            self.put(sql, schema, ast)
+        return ast
@@ -0,0 +1,71 @@
+import json
+import os
+from html import escape
+from typing import Any, Callable, Collection, Dict, Iterable
+
+from utils.sink import JsonlSink, _to_jsonable
+
+SUMMARY_FILE = 'summary.json'
+
+_STYLE = """
+body { margin: 2rem; font-family: sans-serif; }
+table.report { border-collapse: collapse; width: 100%; }
+table.report > thead th { position: sticky; top: 0; background: #eee; }
+table.report > tbody > tr > td, table.report > thead > tr > th {
+    border: 1px solid #ccc; padding: 4px; vertical-align: top; text-align: left; font-family: monospace;
+}
+table.report > tbody > tr > td > div.cell { max-height: 240px; max-width: 600px; overflow: auto; }
+"""
+
+
+def _dump(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=_to_jsonable)
+
+def write_summary(path: str, summary: Dict[str, Any]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=_to_jsonable)
+
+def write_report_data(path: str, summary: Dict[str, Any], records: Iterable[Dict[str, Any]]):
+    """Write `{"summary": ..., "records": [...]}` as compact JSON, one record at a time."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"summary":' + _dump(summary) + ',"records":[')
+        for i, record in enumerate(records):
+            f.write((',\n' if i else '\n') + _dump(record))
+        f.write('\n]}\n')
+
+def _summary_html(summary: Dict[str, Any]) -> str:
+    items = ''.join(f"<li><b>{escape(str(k))}:</b> {escape(_dump(v))}</li>"
+                    for k, v in summary.items() if not isinstance(v, dict))
+    return f"<ul>{items}</ul>"
+
+def write_html_report(path: str, title: str, summary: Dict[str, Any], col_names: Dict[str, str],
+                      rows: Iterable[Dict[str, Any]], html_fields: Collection[str] = ()):
+    """
+    Write a self-contained HTML page: the scalar fields of `summary` and one table row per testcase.
+    Cells of `html_fields` are rendered HTML written as they are, the other cells are escaped.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>{escape(title)}</title>\n"
+                f"<style>{_STYLE}</style>\n</head>\n<body>\n<h1>{escape(title)}</h1>\n{_summary_html(summary)}\n"
+                f"<table class=\"report\">\n<thead><tr>"
+                + ''.join(f"<th>{escape(name)}</th>" for name in col_names.values()) + "</tr></thead>\n<tbody>\n")
+        for row in rows:
+            cells = (row[field] if field in html_fields else escape(str(row[field])) for field in col_names)
+            f.write("<tr>" + ''.join(f"<td><div class=\"cell\">{cell}</div></td>" for cell in cells) + "</tr>\n")
+        f.write("</tbody>\n</table>\n</body>\n</html>\n")
+
+def export_report(report_dir: str, name: str, title: str, summary: Dict[str, Any], sink: JsonlSink,
+                  render: Callable[[Dict[str, Any]], Dict[str, Any]], col_names: Dict[str, str],
+                  html_fields: Collection[str] = ()) -> Dict[str, str]:
+    """
+    Export the records of `sink` as a static report under `report_dir`, without a server:
+    `<name>.html` with the rows rendered by `render` (see `write_html_report`), and `<name>.json` with the raw records.
+    Records are streamed from the sink, none of them is kept in memory.
+    Return the paths of the written files.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    paths = {'html': os.path.join(report_dir, f"{name}.html"), 'data': os.path.join(report_dir, f"{name}.json")}
+    write_html_report(paths['html'], title, summary, col_names, (render(record) for record in sink), html_fields)
+    write_report_data(paths['data'], summary, sink)
+    return paths
@@ -0,0 +1,221 @@
+import gc
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import ijson
+except ImportError:     # optional, tables are then parsed whole with json
+    ijson = None
+
+PRED_TABLE_FILE = 'result/data.json'
+GT_TABLE_FILE = 'gt_data_result.json'
+# binary cache of a table, next to its JSON file: a data and an offsets .npy per column, and a meta.json
+CACHE_SUFFIX = '.npcache'
+_CACHE_META = 'meta.json'
+
+
+def iter_table_rows(f) -> Iterator[List[Any]]:
+    """
+    Yield the rows of a JSON result table one at a time, header first.
+    With ijson installed the file is parsed incrementally, without holding its whole text in memory.
+    """
+    if ijson is None:
+        yield from json.load(f)
+    else:
+        yield from ijson.items(f, 'item', use_float=True)
+
+def load_table(table_file: str) -> Optional[List[List[Any]]]:
+    with open(table_file, 'rb') as f:
+        first = f.read(64).lstrip()
+        f.seek(0)
+        if not first.startswith(b'['):    # e.g. `null` for a failed query
+            return json.load(f)
+        return list(iter_table_rows(f))
+
+def _source_stamp(table_file: str) -> Dict[str, int]:
+    stat = os.stat(table_file)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+class CachedTable(Sequence):
+    """
+    Read-only table backed by the memory-mapped binary cache of a result table, header first.
+    Each column is a UTF-8 data buffer plus the offsets of its cells, so only the rows that are
+    accessed are decoded. Rows are plain lists, and the table compares equal to the same list of rows.
+    """
+    _CHUNK = 4096
+
+    def __init__(self, header: List[str], columns: List[Tuple[np.ndarray, np.ndarray]]):
+        self._header = header
+        self._columns = columns
+        self._n_rows = len(columns[0][0]) - 1 if columns else 0
+
+    def __len__(self):
+        return 1 + self._n_rows
+
+    def _rows(self, start: int, stop: int) -> List[List[str]]:
+        '''Decode the rows `start:stop` of the body, column by column.'''
+        if start >= stop:
+            return []
+        cells = []
+        for offsets, data in self._columns:
+            bounds = offsets[start:stop + 1].tolist()
+            buf = data[bounds[0]:bounds[-1]].tobytes()
+            base = bounds[0]
+            cells.append([buf[lo - base:hi - base].decode('utf-8') for lo, hi in zip(bounds, bounds[1:])])
+        # no cyclic garbage is made while the rows are built, don't let the collector rescan them
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return list(map(list, zip(*cells)))
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            rows = [list(self._header)] if start == 0 < stop else []
+            return rows + self._rows(max(start - 1, 0), max(stop - 1, 0))
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('table index out of range')
+        return list(self._header) if idx == 0 else self._rows(idx - 1, idx)[0]
+
+    def __iter__(self) -> Iterator[List[str]]:
+        yield list(self._header)
+        for start in range(0, self._n_rows, self._CHUNK):
+            yield from self._rows(start, min(start + self._CHUNK, self._n_rows))
+
+    def __eq__(self, other):
+        if isinstance(other, (list, CachedTable)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"CachedTable({len(self)} rows x {len(self._header)} columns)"
+
+
+def read_table_cache(table_file: str) -> Optional[CachedTable]:
+    """Open the binary cache of `table_file`, or return None if there is none or it is older than the file."""
+    cache_dir = table_file + CACHE_SUFFIX
+    try:
+        with open(os.path.join(cache_dir, _CACHE_META), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta['source'] != _source_stamp(table_file):
+        return None
+    columns = [
+        (np.load(os.path.join(cache_dir, f"col_{i}.offsets.npy"), mmap_mode='r'),
+         np.load(os.path.join(cache_dir, f"col_{i}.data.npy"), mmap_mode='r'))
+        for i in range(len(meta['header']))
+    ]
+    return CachedTable(meta['header'], columns)
+
+def write_table_cache(table_file: str, table: Optional[List[List[Any]]]) -> bool:
+    """
+    Write the binary cache of `table_file`: for each column, the UTF-8 bytes of its cells in one buffer
+    and the offsets of the cells in it. Only tables of string cells are cached, the others
+    (e.g. with nulls or numbers) would not round-trip as strings.
+    """
+    if not table or not all(isinstance(key, str) for key in table[0]):
+        return False
+    n_cols = len(table[0])
+    for row in table[1:]:
+        if len(row) != n_cols or not all(type(cell) is str for cell in row):
+            return False
+    cache_dir = table_file + CACHE_SUFFIX
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(table_file)))
+    try:
+        for i in range(n_cols):
+            cells = [row[i].encode('utf-8') for row in table[1:]]
+            offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+            np.cumsum([len(cell) for cell in cells], out=offsets[1:])
+            np.save(os.path.join(tmp_dir, f"col_{i}.offsets.npy"), offsets)
+            np.save(os.path.join(tmp_dir, f"col_{i}.data.npy"), np.frombuffer(b''.join(cells), dtype=np.uint8))
+        with open(os.path.join(tmp_dir, _CACHE_META), 'w', encoding='utf-8') as f:
+            json.dump({'header': table[0], 'source': _source_stamp(table_file)}, f)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.rename(tmp_dir, cache_dir)
+    except OSError:     # e.g. another worker wrote the same cache first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+    return True
+
+
+class ResultTableStore:
+    """
+    Run-scoped store of result tables, keyed by run id.
+    The run directory is listed once, and each table is loaded on demand at most once.
+    With `cache=False` loaded tables are not kept, for callers that read each table once
+    and don't want memory to grow with the suite size.
+    With `binary_cache=True` each table is also written as memory-mappable .npy columns next to
+    its JSON file, and later runs read their rows lazily from those (see `CachedTable`) instead of
+    parsing the JSON again.
+    e.g.
+        root_dir/
+            run_id_1/result/data.json
+            run_id_1/result/data.json.npcache/
+            run_id_2/result/data.json
+            ...
+    """
+    def __init__(self, root_dir: str, table_file: str, cache: bool = True, binary_cache: bool = False):
+        self._root_dir = root_dir
+        self._table_file = table_file
+        self._cache = cache
+        self._binary_cache = binary_cache
+        self._run_ids: List[str] = self._index()
+        self._tables: Dict[str, Optional[List[List[Any]]]] = {}
+
+    @property
+    def run_ids(self) -> List[str]:
+        return self._run_ids
+
+    def _index(self) -> List[str]:
+        '''List the run directories once, sorted by run id.'''
+        if not self._root_dir or not os.path.isdir(self._root_dir):
+            return []
+        return [
+            run_id for run_id in sorted(os.listdir(self._root_dir))
+            if os.path.isdir(os.path.join(self._root_dir, run_id))
+        ]
+
+    def _load(self, run_id: str) -> Optional[List[List[Any]]]:
+        table_file = os.path.join(self._root_dir, run_id, self._table_file)
+        if not os.path.exists(table_file):
+            return None
+        if not self._binary_cache:
+            return load_table(table_file)
+        table = read_table_cache(table_file)
+        if table is None:
+            table = load_table(table_file)
+            write_table_cache(table_file, table)
+        return table
+
+    def get(self, run_id: str) -> Optional[List[List[Any]]]:
+        """Return the table of `run_id`, or None if the run has no table file."""
+        if not self._cache:
+            return self._load(run_id)
+        if run_id not in self._tables:
+            self._tables[run_id] = self._load(run_id)
+        return self._tables[run_id]
+
+    def __len__(self):
+        return len(self._run_ids)
+
+    def __getitem__(self, idx: int) -> Optional[List[List[Any]]]:
+        """Positional access, in the same order as the sorted run directories."""
+        return self.get(self._run_ids[idx])
+
+    def __iter__(self):
+        for run_id in self._run_ids:
+            yield self.get(run_id)
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import sqlite3
 from typing import Dict, List
@@ -11,6 +12,7 @@ class Schema:
         self._schema: Dict[str, List[str]] = schema
         self._idMap = self._map(self._schema)
         self._name = name
+        self._fingerprint = None
 
     @property
     def schema_dict(self):
@@ -20,6 +22,14 @@ class Schema:
     def idMap(self):
         return self._idMap
 
+    @property
+    def fingerprint(self) -> str:
+        '''Hash of the schema name and tables, e.g. to key parse results.'''
+        if self._fingerprint is None:
+            content = json.dumps([self._name, self._schema], sort_keys=True)
+            self._fingerprint = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return self._fingerprint
+
     def _map(self, schema):
         '''
         Map schema to a dict with key as table.column and value as unique identifier
@@ -75,6 +85,18 @@ def get_schema(db):
     return schema
 
 
+def _schema_from_entry(entry):
+    """Build {table_name: [col1, col2, ...]} from one database entry of tables.json,
+    grouping columns by their table index in a single pass.
+    """
+    schema = {table.lower(): [] for table in entry['table_names']}
+    table_names = list(schema.keys())
+    for table_idx, col in entry['column_names_original']:
+        if 0 <= table_idx < len(table_names):     # skip '*' (table index -1)
+            schema[table_names[table_idx]].append(col.lower())
+    return schema
+
+
 def get_schema_from_json(fpath):
     """Return a dict with table name as key and list of column names as value
     """
@@ -89,13 +111,40 @@ def get_schema_from_json(fpath):
     with open(fpath, 'r', encoding='utf-8') as f:
         tables = json.load(f)[0]
     schema_name = tables['db_id']
-    schema = {}
-    for idx, table in enumerate(tables['table_names']):
-        schema[table.lower()] = []
-        for col in tables['column_names_original']:
-            if col[0] == idx:
-                schema[table.lower()].append(col[1].lower())
+    schema = _schema_from_entry(tables)
 
     print(f"Schema loaded from {fpath}: {schema}")
 
-    return schema_name, schema
\ No newline at end of file
+    return schema_name, schema
+
+
+class SchemaRegistry:
+    """
+    Load a multi-database tables.json once and serve one Schema per db_id.
+    Each Schema (including its idMap) is built the first time its db_id is requested.
+    """
+    def __init__(self, fpath):
+        self._fpath = fpath
+        with open(fpath, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        self._entries = {entry['db_id'].lower(): entry for entry in entries}
+        self._schemas: Dict[str, Schema] = {}
+
+    @property
+    def db_ids(self):
+        return list(self._entries.keys())
+
+    def get(self, db_id: str) -> Schema:
+        key = db_id.strip().lower()
+        if key not in self._schemas:
+            if key not in self._entries:
+                raise KeyError(f"Database {db_id} not found in {self._fpath}, available: {self.db_ids}")
+            entry = self._entries[key]
+            self._schemas[key] = Schema(_schema_from_entry(entry), entry['db_id'])
+        return self._schemas[key]
+
+    def __getitem__(self, db_id: str) -> Schema:
+        return self.get(db_id)
+
+    def __contains__(self, db_id: str) -> bool:
+        return db_id.strip().lower() in self._entries
\ No newline at end of file
@@ -0,0 +1,89 @@
+import json
+import os
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+
+def _to_jsonable(val: Any) -> Any:
+    '''Fallback for values json can't serialize, e.g. numpy scalars returned by the evaluator or lazy result tables.'''
+    if isinstance(val, np.generic):
+        return val.item()
+    if isinstance(val, np.ndarray):
+        return val.tolist()
+    if isinstance(val, Sequence):
+        return list(val)
+    return str(val)
+
+
+class JsonlSink:
+    """
+    Append-only JSON lines sink for per-testcase records.
+    Each record is written as soon as it is added, only the byte offset of each record
+    is kept in memory, so records can be paged back without loading the whole file.
+    """
+    def __init__(self, path: str, offsets: List[int] = None):
+        self._path = path
+        self._offsets: List[int] = offsets if offsets is not None else []
+        self._f = None
+        if offsets is None:     # new sink, truncate the file
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._f = open(path, 'wb')
+
+    @classmethod
+    def from_file(cls, path: str) -> 'JsonlSink':
+        """Re-open an existing sink for reading, indexing its record offsets in one pass."""
+        offsets = []
+        pos = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                offsets.append(pos)
+                pos += len(line)
+        return cls(path, offsets)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def write(self, record: Dict[str, Any]):
+        assert self._f is not None, f"Sink {self._path} is read-only"
+        line = (json.dumps(record, ensure_ascii=False, default=_to_jsonable) + '\n').encode('utf-8')
+        self._offsets.append(self._f.tell())
+        self._f.write(line)
+        self._f.flush()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def read(self, idx: int) -> Dict[str, Any]:
+        """Read the record at position `idx`."""
+        return self.read_page(idx, 1)[0]
+
+    def read_page(self, start: int, limit: int) -> List[Dict[str, Any]]:
+        """Read at most `limit` records starting from position `start`."""
+        offsets = self._offsets[start:start + limit]
+        if not offsets:
+            return []
+        records = []
+        with open(self._path, 'rb') as f:
+            f.seek(offsets[0])
+            for _ in offsets:
+                records.append(json.loads(f.readline()))
+        return records
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with open(self._path, 'rb') as f:
+            for _ in range(len(self._offsets)):
+                yield json.loads(f.readline())
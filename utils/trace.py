@@ -0,0 +1,66 @@
+"""
+Structured tracing shared by the lexer, parser and evaluator.
+
+Tracing is off by default, call sites guard their events with a single flag check
+so nothing is formatted when it is off:
+    if trace.ENABLED:
+        trace.event('parse', 'col_ref', pos=self._pos, tok=self._peek())
+Turn it on with `trace.enable()` (`benchmark.py --trace`) or the TEXT2SQL_TRACE=1 env var.
+Events are dicts, logged as JSON lines to the `trace` logger unless handlers are given.
+"""
+import functools
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict
+
+TRACE_ENV_VAR = 'TEXT2SQL_TRACE'
+ENABLED = os.environ.get(TRACE_ENV_VAR, '').strip().lower() not in ('', '0', 'false', 'no')
+
+logger = logging.getLogger('trace')
+_handlers = []
+
+
+def _log_event(record: Dict[str, Any]):
+    logger.info(json.dumps(record, default=str))
+
+def enable(*handlers: Callable[[Dict[str, Any]], None]):
+    """Turn tracing on, events are passed to `handlers` if any, otherwise logged."""
+    global ENABLED
+    ENABLED = True
+    _handlers[:] = handlers
+
+def disable():
+    global ENABLED
+    ENABLED = False
+    _handlers.clear()
+
+def event(stage: str, name: str, **fields):
+    """Emit one event of `stage`, callers check `ENABLED` first."""
+    record = {'stage': stage, 'event': name, **fields}
+    for handler in (_handlers or (_log_event,)):
+        handler(record)
+
+def timed(stage: str):
+    """
+    Decorator emitting a `done` event with the elapsed time of each call when tracing is on,
+    e.g. one per `Lexer.tokenize` / `Parser.parse` / `Evaluator.eval_exec_match`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                event(stage, 'done', func=func.__qualname__,
+                      elapsed_ms=(time.perf_counter() - start) * 1000, error=error)
+        return wrapper
+    return decorator